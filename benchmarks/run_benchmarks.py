@@ -0,0 +1,232 @@
+"""
+Benchmarks for the ticket parser, the categorizer and the dashboard aggregates
+and figures, measured on the same code main.py runs (render, sqlite_store).
+
+Usage (from the repository root):
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --sizes 100 10000 --compare results.json
+
+Every benchmark runs on synthetic data of each requested size (number of item
+lines), reports wall time, throughput and peak Python memory (tracemalloc) and
+writes everything to a JSON file that can be compared between commits.
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import process_data  # noqa: E402
+import render  # noqa: E402
+import rollups  # noqa: E402
+import sqlite_store  # noqa: E402
+import storage  # noqa: E402
+from synthetic_tickets import generate_rows, write_ticket_pdfs  # noqa: E402
+
+DEFAULT_SIZES = [10 ** 2, 10 ** 4, 10 ** 6]
+
+class _Upload(io.BytesIO):
+    """
+    Minimal stand-in for a Streamlit UploadedFile (a named BytesIO) read from disk.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            super().__init__(f.read())
+        self.name = os.path.basename(path)
+
+def measure(fn, track_memory=True):
+    """
+    Runs fn once for timing and, optionally, once more under tracemalloc.
+
+    Returns:
+    - tuple: (seconds, peak_memory_bytes or None)
+    """
+    gc.collect()
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+
+    peak = None
+    if track_memory:
+        gc.collect()
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return seconds, peak
+
+def dashboard_aggregates(tables, month, category):
+    """
+    Runs what main.py computes on a rerun with the default SQLite backend and
+    cold caches, outside of the figures: the summary metrics, the KPIs of the
+    selected month and the row count and first page of both filtered tables.
+    """
+    metrics = render.summary_metrics(tables)
+    sqlite_store.category_totals(month)
+    sqlite_store.ticket_count(month)
+    sqlite_store.list_categories()
+    sqlite_store.row_count(month=month)
+    sqlite_store.month_rows(month, render.TABLE_PAGE_SIZE, 0)
+    sqlite_store.row_count(category=category)
+    sqlite_store.category_rows(category, render.TABLE_PAGE_SIZE, 0)
+    return metrics
+
+def bench_process_pdfs(paths, workers, fast, track_memory):
+    # ingest_pdfs is the core of process_pdfs without the Streamlit report and
+    # the background archive writes, so only parsing and the commit are timed
+    uploads = [_Upload(path) for path in paths]
+    return measure(lambda: process_data.ingest_pdfs(uploads, workers=workers, use_cache=False, fast=fast),
+                   track_memory)
+
+def bench_parser(parser, paths, track_memory):
+    return measure(lambda: [parser(path) for path in paths], track_memory)
+
+def bench_categorize_item(items, track_memory):
+    return measure(lambda: [process_data.categorize_item(item) for item in items], track_memory)
+
+def bench_categorize_items(items, track_memory):
+    series = pd.Series(items)
+    return measure(lambda: process_data.categorize_items(series), track_memory)
+
+def bench_rollups(df, track_memory):
+    return measure(lambda: rollups.compute_rollups(df), track_memory)
+
+def bench_dashboard(df, tables, track_memory):
+    # The database lives in the benchmark's working directory
+    sqlite_store.write_rows(df, "benchmark")
+    month = tables["month_category"]["mes"].iloc[0]
+    category = tables["month_category"]["categoría"].iloc[0]
+    return measure(lambda: dashboard_aggregates(tables, month, category), track_memory)
+
+def bench_figures(tables, track_memory):
+    return measure(lambda: render.build_figures(tables), track_memory)
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(sizes, max_pdf_items, workers, track_memory, only=None):
+    results = []
+
+    def record(benchmark, size, outcome):
+        seconds, peak = outcome
+        result = {
+            "benchmark": benchmark,
+            "size": size,
+            "seconds": round(seconds, 6),
+            "items_per_second": round(size / seconds, 1) if seconds else None,
+            "peak_memory_bytes": peak,
+        }
+        results.append(result)
+        peak_text = f"{peak / 2 ** 20:.1f} MiB" if peak is not None else "-"
+        print(f"{benchmark:<20} {size:>9} items {seconds:>10.4f} s "
+              f"{result['items_per_second'] or 0:>14,.0f} items/s {peak_text:>12}", file=sys.stderr)
+
+    workdir = tempfile.mkdtemp(prefix="mercadata-bench-")
+    cwd = os.getcwd()
+    try:
+        os.chdir(workdir)
+        for size in sizes:
+            if only is None or "parse" in only:
+                if size <= max_pdf_items:
+                    pdf_dir = os.path.join(workdir, "pdfs")
+                    shutil.rmtree(pdf_dir, ignore_errors=True)
+                    paths = write_ticket_pdfs(pdf_dir, size)
+                    record("process_pdfs", size, bench_process_pdfs(paths, workers, True, track_memory))
+                    record("process_pdfs_generic", size, bench_process_pdfs(paths, workers, False, track_memory))
+                    record("parse_ticket", size, bench_parser(process_data.parse_ticket, paths, track_memory))
+                    record("parse_pdf", size, bench_parser(process_data.parse_pdf, paths, track_memory))
+                else:
+                    print(f"{'process_pdfs':<20} {size:>9} items skipped (above --max-pdf-items)", file=sys.stderr)
+
+            rows = generate_rows(size)
+            items = [row[3] for row in rows]
+            if only is None or "categorize" in only:
+                record("categorize_item", size, bench_categorize_item(items, track_memory))
+                record("categorize_items", size, bench_categorize_items(items, track_memory))
+
+            df = pd.DataFrame(rows, columns=storage.COLUMNS)
+            df["categoría"] = process_data.categorize_items(df["item"])
+            if only is None or "aggregate" in only:
+                record("compute_rollups", size, bench_rollups(df, track_memory))
+                tables = rollups.compute_rollups(df)
+                record("dashboard_aggregates", size, bench_dashboard(df, tables, track_memory))
+                record("dashboard_figures", size, bench_figures(tables, track_memory))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def compare(results, baseline_path):
+    """
+    Prints the time ratio of every result against a previous results file.
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["benchmark"], r["size"]): r for r in json.load(f)["results"]}
+
+    print(f"\n{'benchmark':<20} {'size':>9} {'before (s)':>12} {'after (s)':>12} {'speedup':>9}")
+    for result in results:
+        before = baseline.get((result["benchmark"], result["size"]))
+        if before is None:
+            continue
+        speedup = before["seconds"] / result["seconds"] if result["seconds"] else float("inf")
+        print(f"{result['benchmark']:<20} {result['size']:>9} {before['seconds']:>12.4f} "
+              f"{result['seconds']:>12.4f} {speedup:>8.2f}x")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the Mercadata ingest and dashboard code.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Number of item lines per run (default: 100 10000 1000000).")
+    parser.add_argument("--max-pdf-items", type=int, default=10 ** 4,
+                        help="Largest size for which PDFs are generated and parsed (default: 10000).")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes used to parse the PDFs (default: 1).")
+    parser.add_argument("--only", nargs="+", choices=["parse", "categorize", "aggregate"],
+                        help="Run only the given benchmark groups.")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="Skip the tracemalloc pass used to measure peak memory.")
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument("--compare", help="Previous results file to compare against.")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.max_pdf_items, args.workers, not args.no_memory, args.only)
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "workers": args.workers,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
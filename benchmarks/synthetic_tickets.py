@@ -0,0 +1,183 @@
+"""
+Generator of synthetic Mercadona-style tickets for the benchmarks.
+
+Tickets are produced as text lines mimicking the layout of real tickets (store
+header, address, "dd/mm/YYYY HH:MM OP: N" line, item table and totals block),
+as minimal single-page PDFs that pdfplumber can read, or directly as parsed
+item rows. Everything is driven by a seed so runs are reproducible.
+"""
+import os
+import random
+from datetime import datetime, timedelta
+
+ITEMS = [
+    "LECHE ENTERA", "LECHE SEMIDESNATADA", "YOGUR GRIEGO", "QUESO CHEDDAR", "QUESO RALLADO",
+    "PLATANO", "MANZANA GOLDEN", "NARANJA ZUMO", "PAN BAGUETTE", "PAN DE MOLDE",
+    "PECHUGA POLLO", "JAMON SERRANO", "SALMON AHUMADO", "ATUN CLARO", "TOMATE PERA",
+    "CEBOLLA", "PIMIENTO ROJO", "COCA COLA ZERO", "AGUA MINERAL", "CERVEZA MAHOU",
+    "PASTA PENNE", "ARROZ REDONDO", "GALLETAS DIGESTIVE", "PATATAS FRITAS", "DETERGENTE",
+    "PAPEL HIGIENICO", "GEL DE DUCHA", "BOLSA PLASTICO", "HUEVOS L", "SALSA BRAVA",
+    "MEDIALUNAS PARMIG.", "BAYETA MICROFIBRA CR", "CALABAZA TROZOS", "HIELO CUBITO",
+]
+WEIGHED_ITEMS = ["PLATANO", "MANZANA GOLDEN", "TOMATE PERA", "CEBOLLA", "PIMIENTO ROJO", "CALABAZA TROZOS"]
+ADDRESSES = ["AVDA. JUAN PABLO II 2", "C. MAYOR 15", "CALLE ALCALA 210"]
+
+def _price(value):
+    return f"{value:.2f}".replace(".", ",")
+
+def generate_ticket(rng, ticket_id, fecha, n_items):
+    """
+    Generates one ticket.
+
+    Roughly one item in five is a weighed item spread over two lines
+    ("1 PLATANO" followed by "0,474 kg 1,40 €/kg 0,66"), one in four has a
+    quantity above one with unit and total price, and the rest carry a single
+    price.
+
+    Parameters:
+    - rng (random.Random): Source of randomness.
+    - ticket_id (int): Number printed after OP:.
+    - fecha (datetime): Date and time of the purchase.
+    - n_items (int): Number of item lines.
+
+    Returns:
+    - list: The text lines of the ticket.
+    """
+    lines = [
+        "MERCADONA, S.A. A-46103834",
+        rng.choice(ADDRESSES),
+        "46015 VALENCIA",
+        "TELÉFONO: 963000000",
+        f"{fecha:%d/%m/%Y %H:%M} OP: {ticket_id}",
+        f"FACTURA SIMPLIFICADA: 2874-{ticket_id % 1000:03d}-{ticket_id:06d}",
+        "Descripción P. Unit Importe",
+    ]
+    total = 0.0
+    for _ in range(n_items):
+        kind = rng.random()
+        if kind < 0.2:
+            name = rng.choice(WEIGHED_ITEMS)
+            weight = rng.uniform(0.1, 2.5)
+            unit = rng.uniform(0.8, 4.5)
+            amount = round(weight * unit, 2)
+            lines.append(f"1 {name}")
+            lines.append(f"{weight:.3f}".replace(".", ",") + f" kg {_price(unit)} €/kg {_price(amount)}")
+        elif kind < 0.45:
+            quantity = rng.randint(2, 6)
+            unit = round(rng.uniform(0.5, 6.0), 2)
+            amount = round(quantity * unit, 2)
+            lines.append(f"{quantity} {rng.choice(ITEMS)} {_price(unit)} {_price(amount)}")
+        else:
+            amount = round(rng.uniform(0.3, 12.0), 2)
+            lines.append(f"1 {rng.choice(ITEMS)} {_price(amount)}")
+        total += amount
+
+    lines += [
+        f"TOTAL (€) {_price(total)}",
+        f"TARJETA BANCARIA {_price(total)}",
+        "IVA BASE IMPONIBLE (€) CUOTA (€)",
+        f"10% {_price(total / 1.1)} {_price(total - total / 1.1)}",
+    ]
+    return lines
+
+def generate_tickets(n_items, seed=0, items_per_ticket=(5, 40), start=datetime(2021, 1, 1)):
+    """
+    Generates tickets until n_items item lines have been produced.
+
+    Yields:
+    - tuple: (ticket_id, fecha, lines) for every ticket.
+    """
+    rng = random.Random(seed)
+    fecha = start
+    ticket_id = 1000
+    remaining = n_items
+    while remaining > 0:
+        n = min(remaining, rng.randint(*items_per_ticket))
+        fecha = fecha + timedelta(days=rng.randint(0, 4), minutes=rng.randint(0, 600))
+        fecha = fecha.replace(hour=rng.randint(9, 21))
+        ticket_id += 1
+        yield ticket_id, fecha, generate_ticket(rng, ticket_id, fecha, n)
+        remaining -= n
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_ticket_pdf(path, lines):
+    """
+    Writes the ticket lines as a single-page PDF using the standard Courier font.
+
+    The file is built by hand so the benchmarks do not need a PDF writer
+    library; text is encoded with WinAnsiEncoding, which covers "€" and the
+    accented characters found on tickets.
+    """
+    leading = 11
+    height = max(842, leading * (len(lines) + 4))
+    content = ["BT", "/F1 9 Tf", f"{leading} TL", f"20 {height - 30} Td"]
+    for line in lines:
+        content.append(f"({_pdf_escape(line)}) Tj T*")
+    content.append("ET")
+    stream = "\n".join(content).encode("cp1252")
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 300 {height}] "
+        f"/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>".encode(),
+        b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+
+    with open(path, "wb") as f:
+        f.write(out)
+
+def write_ticket_pdfs(directory, n_items, seed=0):
+    """
+    Writes synthetic tickets totalling n_items item lines as PDFs.
+
+    Returns:
+    - list: Paths of the written PDFs, in generation order.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for ticket_id, _, lines in generate_tickets(n_items, seed):
+        path = os.path.join(directory, f"ticket_{ticket_id}.pdf")
+        write_ticket_pdf(path, lines)
+        paths.append(path)
+    return paths
+
+def generate_rows(n_items, seed=0):
+    """
+    Generates parsed item rows directly, without going through PDFs.
+
+    Returns:
+    - list: [fecha, identificativo, ubicacion, item, categoria, precio] rows
+      like the ones produced by process_data.parse_pdf, with an empty
+      category to be filled by the categorizer.
+    """
+    rows = []
+    for ticket_id, fecha, lines in generate_tickets(n_items, seed):
+        ubicacion = lines[1]
+        fecha_text = f"{fecha:%d/%m/%Y %H:%M}"
+        for line in lines[7:]:
+            if line.startswith("TOTAL"):
+                break
+            if " kg " in line:
+                rows[-1][5] = float(line.rsplit(" ", 1)[1].replace(",", "."))
+                continue
+            quantity, rest = line.split(" ", 1)
+            parts = rest.split(" ")
+            prices = [part for part in parts if "," in part and part.replace(",", "").isdigit()]
+            name = " ".join(part for part in parts if part not in prices)
+            precio = float(prices[-1].replace(",", ".")) if prices else 0.0
+            rows.append([fecha_text, str(ticket_id), ubicacion, name, "", precio])
+    return rows
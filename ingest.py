@@ -0,0 +1,154 @@
+"""
+Command-line ingestion of ticket PDFs, independent of the Streamlit app.
+
+Examples (from the repository root):
+
+    python ingest.py                          # every PDF under data/pdfs
+    python ingest.py tickets/ extra.pdf --workers 8
+    python ingest.py data/pdfs --watch --interval 60
+    python ingest.py --timings timings.csv    # per-stage timings as CSV (or .json)
+
+Tickets are appended incrementally to data/mercadata.csv (use --overwrite to
+replace it with the given files). Progress goes to stderr and the exit code
+is 0 on success, 1 when some files could not be parsed and 2 on bad
+arguments.
+"""
+import argparse
+import os
+import sys
+import time
+
+import process_data
+
+EXIT_OK = 0
+EXIT_PARSE_ERRORS = 1
+EXIT_USAGE = 2
+
+def find_pdfs(paths):
+    """
+    Expands files and directories (searched recursively) into PDF paths.
+
+    Returns:
+    - list: Sorted, de-duplicated paths of the PDF files found.
+    """
+    found = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                found.update(os.path.join(root, name) for name in files if name.lower().endswith(".pdf"))
+        elif os.path.isfile(path):
+            found.add(path)
+    return sorted(found)
+
+def print_progress(done, total, pdf_path, error=None):
+    print(f"[{done}/{total}] {pdf_path}{' (error)' if error else ''}", file=sys.stderr)
+
+def run_batch(pdf_paths, args):
+    """
+    Ingests a batch of PDFs and reports the outcome.
+
+    Returns:
+    - int: The exit code of the batch.
+    """
+    start = time.perf_counter()
+    result = process_data.ingest_pdfs(
+        pdf_paths,
+        workers=args.workers,
+        use_cache=not args.no_cache,
+        incremental=not args.overwrite,
+        fast=not args.generic,
+        progress=None if args.quiet else print_progress,
+    )
+    elapsed = time.perf_counter() - start
+
+    for pdf_path, error in result["errors"]:
+        print(f"error: {pdf_path}: {error}", file=sys.stderr)
+
+    rows = 0 if result["rows"] is None else len(result["rows"])
+    print(f"{result['files']} file(s), {result['new_tickets']} new ticket(s), {rows} row(s) written "
+          f"to {process_data.output_csv} in {elapsed:.2f}s ({result['files'] / elapsed if elapsed else 0:.1f} files/s), "
+          f"{len(result['errors'])} error(s)", file=sys.stderr)
+
+    if args.timings:
+        result["timings"].save(args.timings)
+        if not args.quiet:
+            print(result["timings"].summary().to_string(), file=sys.stderr)
+    return EXIT_PARSE_ERRORS if result["errors"] else EXIT_OK
+
+def watch(paths, args):
+    """
+    Polls the given paths and ingests new or modified PDFs as they appear.
+
+    A file is only picked up once its size and modification time are the same
+    on two consecutive scans, so PDFs still being copied are not read half
+    written. A batch that fails (e.g. the disk is full) is reported and
+    retried on the next scan. Runs until interrupted.
+    """
+    ingested = {}
+    previous = {}
+    while True:
+        current = {}
+        for pdf_path in find_pdfs(paths):
+            try:
+                stat = os.stat(pdf_path)
+            except OSError:
+                continue
+            current[pdf_path] = (stat.st_size, stat.st_mtime_ns)
+
+        ready = [pdf_path for pdf_path, signature in current.items()
+                 if previous.get(pdf_path) == signature and ingested.get(pdf_path) != signature]
+        if ready:
+            try:
+                run_batch(ready, args)
+            except Exception as e:
+                print(f"error: batch of {len(ready)} file(s) failed, retrying on the next scan: "
+                      f"{type(e).__name__}: {e}", file=sys.stderr)
+            else:
+                for pdf_path in ready:
+                    ingested[pdf_path] = current[pdf_path]
+
+        previous = current
+        time.sleep(args.interval)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest Mercadona ticket PDFs into the Mercadata dataset.")
+    parser.add_argument("paths", nargs="*", default=[process_data.data_path],
+                        help=f"PDF files or directories to ingest (default: {process_data.data_path}).")
+    parser.add_argument("--workers", type=int, default=process_data.PARSE_WORKERS,
+                        help="Worker processes used to parse the PDFs (default: number of CPUs).")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="Replace the dataset with the given files instead of appending new tickets.")
+    parser.add_argument("--no-cache", action="store_true", help="Parse every file even if it was parsed before.")
+    parser.add_argument("--generic", action="store_true", help="Always use the generic pdfplumber parser.")
+    parser.add_argument("--watch", action="store_true", help="Keep running and ingest new PDFs as they appear.")
+    parser.add_argument("--interval", type=float, default=30.0,
+                        help="Seconds between directory scans in --watch mode (default: 30).")
+    parser.add_argument("--quiet", action="store_true", help="Do not print per-file progress.")
+    parser.add_argument("--timings", metavar="PATH",
+                        help="Write the per-stage timings of the batch to PATH (CSV if it ends in .csv, JSON otherwise).")
+    args = parser.parse_args(argv)
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.watch and args.overwrite:
+        parser.error("--watch cannot be combined with --overwrite")
+
+    missing = [path for path in args.paths if not os.path.exists(path)]
+    if missing and not args.watch:
+        print(f"error: not found: {', '.join(missing)}", file=sys.stderr)
+        return EXIT_USAGE
+
+    if args.watch:
+        try:
+            watch(args.paths, args)
+        except KeyboardInterrupt:
+            return EXIT_OK
+
+    pdf_paths = find_pdfs(args.paths)
+    if not pdf_paths:
+        print("No PDF files found.", file=sys.stderr)
+        return EXIT_OK
+    return run_batch(pdf_paths, args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+import queue
+import threading
+import time
+import uuid
+import process_data
+
+# Maximum number of ingest jobs waiting for the worker; further submissions are rejected
+JOB_QUEUE_SIZE = 4
+
+# Number of finished jobs kept so their outcome can still be reported
+JOB_HISTORY = 20
+
+class IngestJob:
+    """
+    A batch of PDFs ingested in the background with process_data.ingest_pdfs.
+
+    Progress is updated by the worker thread as every file is parsed and read
+    by the UI through snapshot(). Nothing is written to the dataset until the
+    whole batch is parsed, so an unfinished job leaves it untouched.
+    """
+
+    def __init__(self, pdf_files, archive=False, **options):
+        self.id = uuid.uuid4().hex[:12]
+        self.options = options
+        self.total = len(pdf_files)
+        self.done = 0
+        self.current = None
+        self.errors = []
+        self.status = "queued"
+        self.result = None
+        self.failure = None
+        self.started = None
+        self.finished = None
+        self._pdf_files = list(pdf_files)
+        self._archive = archive
+        self._lock = threading.Lock()
+
+    def _progress(self, done, total, name, error=None):
+        with self._lock:
+            self.done = done
+            self.current = name
+            if error is not None:
+                self.errors.append((name, error))
+
+    def run(self):
+        with self._lock:
+            self.status = "running"
+            self.started = time.perf_counter()
+        try:
+            archived = []
+            if self._archive:
+                for pdf_file in self._pdf_files:
+                    future = process_data.archive_pdf(pdf_file.name, process_data.pdf_bytes(pdf_file))
+                    archived.append((pdf_file.name, future))
+            result = process_data.ingest_pdfs(self._pdf_files, progress=self._progress, **self.options)
+            result["archive_errors"] = process_data.archive_errors(archived)
+            with self._lock:
+                self.result = result
+                self.errors = result["errors"]
+                self.status = "done"
+        except Exception as e:
+            with self._lock:
+                self.failure = f"{type(e).__name__}: {e}"
+                self.status = "failed"
+        finally:
+            with self._lock:
+                self.finished = time.perf_counter()
+                # The uploads are no longer needed once parsed
+                self._pdf_files = None
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def snapshot(self):
+        """
+        Returns a consistent view of the job's progress.
+
+        Returns:
+        - dict: status, total, done, current (file being reported), errors
+          (list of (name, message)), elapsed seconds, throughput in files per
+          second, failure (message of the exception that stopped the job) and
+          result (what ingest_pdfs returned plus archive_errors, see
+          process_data.process_pdfs; None until the job is done).
+        """
+        with self._lock:
+            elapsed = 0.0
+            if self.started is not None:
+                elapsed = (self.finished or time.perf_counter()) - self.started
+            return {
+                "status": self.status,
+                "total": self.total,
+                "done": self.done,
+                "current": self.current,
+                "errors": list(self.errors),
+                "elapsed": elapsed,
+                "throughput": self.done / elapsed if elapsed else 0.0,
+                "failure": self.failure,
+                "result": self.result,
+            }
+
+class IngestQueue:
+    """
+    Runs ingest jobs one at a time on a daemon worker thread.
+
+    The queue is bounded by JOB_QUEUE_SIZE so a burst of uploads cannot pile
+    up unbounded work (and memory); submit() raises queue.Full instead.
+    """
+
+    def __init__(self, maxsize=JOB_QUEUE_SIZE):
+        self.jobs = {}
+        self._queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._work, name="ingest-worker", daemon=True)
+        self._worker.start()
+
+    def submit(self, pdf_files, archive=False, **options):
+        """
+        Queues a batch of PDFs for ingestion.
+
+        Parameters:
+        - pdf_files (list): PDF files as accepted by process_data.ingest_pdfs.
+        - archive (bool): Save a copy of every file under process_data.data_path.
+        - options: Keyword arguments for process_data.ingest_pdfs.
+
+        Returns:
+        - IngestJob: The queued job.
+        """
+        job = IngestJob(pdf_files, archive=archive, **options)
+        with self._lock:
+            self._queue.put_nowait(job)
+            self.jobs[job.id] = job
+            finished = [job_id for job_id, other in self.jobs.items() if not other.active]
+            for job_id in finished[:max(0, len(finished) - JOB_HISTORY)]:
+                del self.jobs[job_id]
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                job.run()
+            finally:
+                self._queue.task_done()
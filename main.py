@@ -1,9 +1,14 @@
 import os
-import pandas as pd
+import queue
+import time
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
-from process_data import process_pdfs  # Solo importamos process_pdfs
+import jobs
+import render
+import rollups
+import sqlite_store
+import storage
+import timing
+from process_data import ARCHIVE_UPLOADS, ensure_dataset, show_ingest_result
 
 # Configuración de la página de Streamlit
 st.set_page_config(
@@ -17,6 +22,102 @@ st.set_page_config(
 csv_path = "data/mercadata.csv"
 logo_path = "images/logo.png"  # Cambia esto a la ubicación de tu archivo de logo
 
+# Motor de los filtros por mes y categoría: "sqlite" (consultas indexadas sobre
+# data/mercadata.db, sin cargar el dataset) o "pandas" (dataset completo en memoria)
+query_backend = "sqlite"
+
+# Segundos entre refrescos de la página mientras hay una ingesta en curso
+INGEST_POLL_SECONDS = 1.0
+
+# Tiempos de esta ejecución del script (se muestran en el panel de rendimiento)
+perf = timing.TimingLog()
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def load_data(dataset_version):
+    """
+    Loads the whole dataset indexed and sorted by fecha.
+
+    The result is memoized per dataset version, so reruns triggered by widget
+    interactions reuse it without touching the disk. Every rewrite of a month
+    changes the version and invalidates the cached frame.
+
+    Parameters:
+    - dataset_version (str): Token returned by storage.dataset_version().
+
+    Returns:
+    - pd.DataFrame: All rows with a DatetimeIndex named fecha.
+    """
+    data = storage.read_dataset()
+    data.set_index("fecha", inplace=True)
+    return data.sort_index(kind="mergesort")
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def load_rollups(rollups_version):
+    """
+    Loads the pre-aggregated tables the charts and metrics are rendered from,
+    memoized per version of the rollups directory.
+    """
+    return rollups.load_rollups()
+
+@st.cache_resource
+def get_ingest_queue():
+    """
+    Background ingest worker shared by every session of the app, so batches
+    are ingested one at a time and survive reruns.
+    """
+    return jobs.IngestQueue()
+
+# The SQLite reads are memoized per sqlite_store.source_version(), the version
+# of the data the database actually holds: an ingest updates the columnar
+# store before the database, so the store's version may already be newer
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def load_month(month, sqlite_version, offset, limit):
+    """
+    A page of the rows of a month, queried through the month index of the SQLite database.
+    """
+    return sqlite_store.month_rows(month, limit, offset)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def load_category(category, sqlite_version, offset, limit):
+    """
+    A page of the rows of a category, queried through the category index of the SQLite database.
+    """
+    return sqlite_store.category_rows(category, limit, offset)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def count_rows(sqlite_version, month=None, category=None):
+    """
+    Number of rows of a month or category in the SQLite database.
+    """
+    return sqlite_store.row_count(month=month, category=category)
+
+@st.cache_data(show_spinner=False, max_entries=2)
+def load_categories(sqlite_version):
+    """
+    Categories present in the SQLite database.
+    """
+    return sqlite_store.list_categories()
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def load_month_summary(month, sqlite_version):
+    """
+    Spend per category and number of tickets of a month, aggregated in the SQLite database.
+    """
+    return sqlite_store.category_totals(month), sqlite_store.ticket_count(month)
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def chart_figures(rollups_version, max_points):
+    """
+    Builds every chart of the dashboard from the rollups (see render.build_figures).
+
+    The figure dicts are memoized per rollups version, so reruns caused by the
+    filters reuse them instead of rebuilding them with Plotly Express. On a
+    cache miss every aggregation and figure build is timed into the log the
+    caller is collecting into.
+    """
+    return render.build_figures(load_rollups(rollups_version), max_points)
+
 # Mostrar el logo como banner en la parte superior
 if os.path.exists(logo_path):
     st.image(logo_path, width=600)  # Ajusta el ancho del logo según tu preferencia
@@ -32,36 +133,87 @@ if uploaded_files:
     # Procesar los archivos PDF cuando el botón es presionado
     if st.button("Procesar PDFs"):
         try:
-            # Pasar los archivos PDF a la función de procesamiento
-            process_pdfs(uploaded_files)  # Asegúrate de que esta función esté bien definida en process_data.py
-            st.success("Archivos PDF procesados correctamente.")
-        except Exception as e:
-            st.error(f"Error al procesar los archivos PDF: {e}")
+            # Procesar en segundo plano; el dashboard sigue disponible mientras tanto
+            job = get_ingest_queue().submit(uploaded_files, archive=ARCHIVE_UPLOADS, incremental=True)
+            st.session_state["ingest_job"] = job.id
+        except queue.Full:
+            st.warning("Hay demasiados lotes de PDFs en cola. Inténtalo de nuevo en unos segundos.")
 else:
     st.warning("Por favor, sube al menos un archivo PDF para continuar.")
 
+# Progreso de la ingesta en segundo plano de esta sesión
+# (todas las decisiones se toman sobre una misma instantánea del trabajo, que
+# el hilo de ingesta puede terminar en cualquier momento)
+ingest_job = get_ingest_queue().get(st.session_state.get("ingest_job"))
+ingest_active = False
+if ingest_job is not None:
+    status = ingest_job.snapshot()
+    ingest_active = status["status"] in ("queued", "running")
+    if ingest_active:
+        if status["status"] == "queued":
+            st.progress(0.0, text="PDFs en cola, esperando a que termine otra ingesta...")
+        else:
+            st.progress(status["done"] / status["total"] if status["total"] else 1.0,
+                        text=f"Procesando PDFs: {status['done']}/{status['total']} "
+                             f"({status['throughput']:.1f} archivos/s)")
+        for name, error in status["errors"]:
+            st.warning(f"No se pudo procesar {os.path.basename(name)}: {error}")
+    else:
+        del st.session_state["ingest_job"]
+        if status["status"] == "failed":
+            st.error(f"Error al procesar los archivos PDF: {status['failure']}")
+        else:
+            show_ingest_result(status["result"], incremental=True)
+            st.session_state["ingest_timings"] = status["result"]["timings"]
+            st.success(f"Archivos PDF procesados correctamente en {status['elapsed']:.1f} s.")
+
+# Cargar los datos una sola vez por versión del dataset; todas las secciones comparten el mismo frame
+# (sin esperar a otras sesiones: si alguna está escribiendo, se leen los ficheros tal como están)
+with perf.stage("ensure_dataset", scope="dashboard"):
+    has_data = ensure_dataset(sqlite=query_backend == "sqlite")
+if has_data:
+    with perf.stage("load_data", scope="dashboard"):
+        if query_backend == "sqlite":
+            sqlite_version = sqlite_store.source_version()
+        else:
+            data = load_data(storage.dataset_version())
+    with perf.stage("load_rollups", scope="dashboard"):
+        rollups_version = storage.dataset_version(rollups.rollups_path)
+        tables = load_rollups(rollups_version)
+
 # Barra lateral
 with st.sidebar:
     st.title('🛒 Mercadona Data Analysis')
     
 
     # Filtro por meses
-    if os.path.exists(csv_path):
+    if has_data:
         try:
-            data = pd.read_csv(csv_path)
-            data["fecha"] = pd.to_datetime(data["fecha"], format="%d/%m/%Y %H:%M", dayfirst=True)
-            data.set_index("fecha", inplace=True)
-            
-            month_start_dates = data.index.to_period("M").to_timestamp().drop_duplicates().sort_values()
-            selected_month_start = st.selectbox("Selecciona el mes", month_start_dates.strftime('%Y-%m'), index=0)
-            selected_month_start = pd.Timestamp(selected_month_start)
-            filtered_data_by_month = data[data.index.to_period("M").start_time == selected_month_start]
+            month_start_dates = storage.list_months()
+            selected_month_start = st.selectbox("Selecciona el mes", month_start_dates, index=0)
+            # Las tablas se envían al navegador por páginas (ver render.paginated_dataframe)
+            with perf.stage("filter_month", scope="dashboard"):
+                if query_backend == "sqlite":
+                    month_rows_total = count_rows(sqlite_version, month=selected_month_start)
+                    fetch_month_page = lambda offset, limit: load_month(selected_month_start, sqlite_version, offset, limit)
+                else:
+                    filtered_data_by_month = data.loc[selected_month_start]
+                    month_rows_total = len(filtered_data_by_month)
+                    fetch_month_page = lambda offset, limit: filtered_data_by_month.iloc[offset:offset + limit]
             
             # Filtro por categoría
-            selected_category = st.selectbox("Selecciona la categoría", data["categoría"].unique())
-            filtered_data_by_categories = data[data["categoría"] == selected_category]
+            categories = load_categories(sqlite_version) if query_backend == "sqlite" else data["categoría"].unique()
+            selected_category = st.selectbox("Selecciona la categoría", categories)
+            with perf.stage("filter_category", scope="dashboard"):
+                if query_backend == "sqlite":
+                    category_rows_total = count_rows(sqlite_version, category=selected_category)
+                    fetch_category_page = lambda offset, limit: load_category(selected_category, sqlite_version, offset, limit)
+                else:
+                    filtered_data_by_categories = data[data["categoría"] == selected_category]
+                    category_rows_total = len(filtered_data_by_categories)
+                    fetch_category_page = lambda offset, limit: filtered_data_by_categories.iloc[offset:offset + limit]
         except Exception as e:
-            st.error(f"Error al leer el archivo CSV: {e}")
+            st.error(f"Error al leer los datos: {e}")
     else:
         st.error(f"Archivo {csv_path} no encontrado. Asegúrate de que `process_data.py` haya sido ejecutado correctamente.")
 
@@ -70,51 +222,51 @@ with st.sidebar:
         - Esta aplicación pretende analizar los patrones de gasto en diferentes categorías y a lo largo del tiempo.
     ''')
 
-# Verificar si el archivo CSV existe y no está vacío
-if os.path.exists(csv_path):
+# Verificar si hay datos almacenados
+if has_data:
     try:
-        data = pd.read_csv(csv_path)
-        if not data.empty:
-            data["fecha"] = pd.to_datetime(data["fecha"], format="%d/%m/%Y %H:%M", dayfirst=True)
-            data.set_index("fecha", inplace=True)
-
-            # Métricas relevantes
-            total_spent = data["precio"].sum()
-            total_purchases = data["identificativo de ticket"].nunique()
-            avg_spent_per_purchase = data.groupby("identificativo de ticket")["precio"].sum().mean()
-            category_with_highest_spent = data.groupby("categoría")["precio"].sum().idxmax()
-            total_items_sold = data['item'].nunique()
-            avg_spent_per_month = data["precio"].resample('M').sum().mean()
-            total_tickets_per_month = data.groupby(data.index.to_period('M')).size().mean()
+        if not tables["month_category"].empty:
+            # Métricas relevantes, calculadas a partir de los agregados mantenidos al ingerir
+            with perf.stage("metrics", scope="dashboard"):
+                metrics = render.summary_metrics(tables)
+                if query_backend == "sqlite":
+                    # KPIs del mes seleccionado, calculados en SQLite a través del índice por mes
+                    totals_per_category_in_month, purchases_in_month = load_month_summary(selected_month_start, sqlite_version)
+                else:
+                    totals_per_category_in_month = rollups.category_totals(tables, selected_month_start)
+                    purchases_in_month = rollups.ticket_count(tables, selected_month_start)
 
             # Crear columnas para las métricas
             col1, col2, col3 = st.columns(3)
 
             # Mostrar las métricas en las columnas
             with col1:
-                st.metric(label="Gasto Total", value=f"€{total_spent:.2f}")
-                st.metric(label="Gasto Promedio por Compra", value=f"€{avg_spent_per_purchase:.2f}")
-                st.metric(label="Número Total de Compras", value=total_purchases)
-                st.metric(label="Items Vendidos", value=total_items_sold)
+                st.metric(label="Gasto Total", value=f"€{metrics['total_spent']:.2f}")
+                st.metric(label="Gasto Promedio por Compra", value=f"€{metrics['avg_spent_per_purchase']:.2f}")
+                st.metric(label="Número Total de Compras", value=metrics["total_purchases"])
+                st.metric(label="Items Vendidos", value=metrics["total_items_sold"])
 
             with col2:
-                st.metric(label="Categoría con Mayor Gasto", value=category_with_highest_spent)
-                st.metric(label="Gasto Promedio Mensual", value=f"€{avg_spent_per_month:.2f}")
-                st.metric(label="Items por Mes", value=f"{total_tickets_per_month:.2f}")
+                st.metric(label="Categoría con Mayor Gasto", value=metrics["category_with_highest_spent"])
+                st.metric(label="Gasto Promedio Mensual", value=f"€{metrics['avg_spent_per_month']:.2f}")
+                st.metric(label="Items por Mes", value=f"{metrics['items_per_month']:.2f}")
 
             with col3:
-                st.metric(label="Total Gastado en el Mes Seleccionado", value=f"€{filtered_data_by_month['precio'].sum():.2f}")
-                st.metric(label="Número de Compras en el Mes Seleccionado", value=filtered_data_by_month['identificativo de ticket'].nunique())
-                st.metric(label="Categoría con Mayor Gasto en el Mes Seleccionado", value=filtered_data_by_month.groupby("categoría")["precio"].sum().idxmax())
+                st.metric(label="Total Gastado en el Mes Seleccionado", value=f"€{totals_per_category_in_month['precio'].sum():.2f}")
+                st.metric(label="Número de Compras en el Mes Seleccionado", value=purchases_in_month)
+                st.metric(label="Categoría con Mayor Gasto en el Mes Seleccionado", value=totals_per_category_in_month["precio"].idxmax())
+
+            # Gráficos, construidos una sola vez por versión de los agregados; "figures"
+            # mide solo la consulta a la caché, sin las etapas de construcción anidadas
+            with timing.collecting(perf, scope="dashboard"), timing.stage("figures"):
+                figures = chart_figures(rollups_version, render.MAX_CHART_POINTS)
 
             # Crear una sola fila con el gráfico de distribución del gasto por categoría (Pie Chart)
             st.subheader("Distribución del Gasto")
             col1 = st.columns(1)[0]
             with col1:
                 # Distribución del Gasto por Categoría
-                total_price_per_category = data.groupby("categoría")["precio"].sum().reset_index()
-                fig_pie = px.pie(total_price_per_category, values='precio', names='categoría', title='Distribución del Gasto por Categoría')
-                st.plotly_chart(fig_pie)
+                st.plotly_chart(figures["pie"])
 
             # Crear una segunda fila con los gráficos de gasto total por mes y precio medio por categoría
             st.subheader("Análisis de Gasto por Tiempo y Categoría")
@@ -122,15 +274,11 @@ if os.path.exists(csv_path):
 
             with col1:
                 # Gasto Total por Mes
-                monthly_expense = data["precio"].resample('M').sum().reset_index()
-                fig_bar = px.bar(monthly_expense, x='fecha', y='precio', labels={'fecha': 'Mes', 'precio': 'Gasto (€)'})
-                st.plotly_chart(fig_bar)
+                st.plotly_chart(figures["monthly"])
 
             with col2:
                 # Precio Medio por Categoría
-                avg_price_per_category = data.groupby("categoría")["precio"].mean().reset_index().sort_values(by="precio", ascending=False)
-                fig_bar_avg = px.bar(avg_price_per_category, x='categoría', y='precio', labels={'precio': 'Precio Medio (€)'})
-                st.plotly_chart(fig_bar_avg)
+                st.plotly_chart(figures["avg_price"])
 
 
             # Análisis del Gasto en el Tiempo y Top 10 Items
@@ -138,83 +286,60 @@ if os.path.exists(csv_path):
 
             with col1:
                 # Gasto Total por Semana
-                weekly_expense = data["precio"].resample('W').sum().reset_index()  # Resample to weekly
-                fig_weekly_bar = px.bar(
-                    weekly_expense,
-                    x='fecha',
-                    y='precio',
-                    labels={'fecha': 'Semana', 'precio': 'Gasto (€)'},
-                    title='Gasto Total por Semana'
-                )
-                fig_weekly_bar.update_layout(xaxis_title='Semana', yaxis_title='Gasto (€)')
-                st.plotly_chart(fig_weekly_bar)
+                st.plotly_chart(figures["weekly"])
 
 
             with col2:
                 # Top 10 Items con Mayor Gasto
-                top_items = data.groupby('item')['precio'].sum().nlargest(10).reset_index()
-                fig_top_items = px.bar(top_items, x='item', y='precio', labels={'item': 'Item', 'precio': 'Gasto (€)'},
-                                       title='Top 10 Items con Mayor Gasto')
-                st.plotly_chart(fig_top_items)
+                st.plotly_chart(figures["top_items"])
 
             # Datos Filtrados
             col1, col2 = st.columns(2)
 
             with col1:
                 st.subheader("Datos Filtrados por Categorías")
-                st.dataframe(filtered_data_by_categories)
+                render.paginated_dataframe(category_rows_total, fetch_category_page, key=f"page_category_{selected_category}")
 
             with col2:
                 st.subheader("Datos Filtrados por Mes")
-                st.dataframe(filtered_data_by_month)
+                render.paginated_dataframe(month_rows_total, fetch_month_page, key=f"page_month_{selected_month_start}")
 
             # Heatmap del gasto por día y hora
             st.subheader("Heatmap del Gasto por Día y Hora")
-            # Ensure 'hour_of_day' is limited to the opening hours (9 to 23)
-            data['day_of_week'] = data.index.dayofweek
-            data['hour_of_day'] = data.index.hour
-
-            # Filter data for hours between 9 and 23
-            data_filtered = data[(data['hour_of_day'] >= 9) & (data['hour_of_day'] <= 22)]
-
-            # Create a range of hours from 9 to 23 and days of the week
-            hours = list(range(9, 23))
-            days = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
-
-            # Create the pivot table with the filtered data
-            heatmap_data = data_filtered.pivot_table(
-                values='precio',
-                index='hour_of_day',
-                columns='day_of_week',
-                aggfunc='sum',
-                fill_value=0
-            ).reindex(index=hours, columns=range(7), fill_value=0)  # Ensure full range of hours and days
-
-            # Create the heatmap
-            fig_heatmap = go.Figure(
-                data=go.Heatmap(
-                    z=heatmap_data.values,
-                    x=days,  # Day names
-                    y=hours,  # Limited to 9-23
-                    colorscale='Viridis'
-                )
-            )
-
-            # Update layout
-            fig_heatmap.update_layout(
-                xaxis_title='Día de la Semana',
-                yaxis_title='Hora del Día',
-                yaxis=dict(dtick=1)  # Ensure ticks for every hour
-            )
-
-            # Display the heatmap
-            st.plotly_chart(fig_heatmap)
+            st.plotly_chart(figures["heatmap"])
 
 
         else:
             st.warning("El archivo CSV está vacío. Por favor, asegúrate de que `process_data.py` haya generado datos correctamente.")
     
     except Exception as e:
-        st.error(f"Error al leer el archivo CSV: {e}")
+        st.error(f"Error al leer los datos: {e}")
 else:
-    st.error(f"Archivo {csv_path} no encontrado. Asegúrate de que `process_data.py` haya sido ejecutado correctamente.")
\ No newline at end of file
+    st.error(f"Archivo {csv_path} no encontrado. Asegúrate de que `process_data.py` haya sido ejecutado correctamente.")
+# Panel de rendimiento (al final, para incluir los tiempos de todas las secciones)
+with st.sidebar:
+    if st.checkbox("Mostrar rendimiento"):
+        st.subheader("Rendimiento")
+        st.caption("Tiempos de esta ejecución del dashboard (s)")
+        st.dataframe(perf.summary())
+
+        ingest_timings = st.session_state.get("ingest_timings")
+        if ingest_timings is not None and ingest_timings.records:
+            st.caption("Tiempos de la última ingesta (s)")
+            st.dataframe(ingest_timings.summary())
+            ingest_frame = ingest_timings.to_frame()
+            slowest = ingest_frame[ingest_frame["scope"] == "ticket"].groupby("name")["seconds"].sum().nlargest(5)
+            if not slowest.empty:
+                st.caption("Tickets más lentos (s)")
+                st.dataframe(slowest)
+
+        # Exportar los tiempos de esta ejecución junto con los de la última ingesta
+        export = timing.TimingLog(perf.run)
+        export.records = perf.records + (ingest_timings.records if ingest_timings is not None else [])
+        st.download_button("Descargar tiempos (JSON)", export.to_json(), file_name="timings.json", mime="application/json")
+        st.download_button("Descargar tiempos (CSV)", export.to_csv(), file_name="timings.csv", mime="text/csv")
+
+# Mientras la ingesta siga en curso, volver a ejecutar la página para refrescar su progreso
+if ingest_active:
+    time.sleep(INGEST_POLL_SECONDS)
+    st.rerun()
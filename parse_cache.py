@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+import shutil
+import transactions
+
+# Default location and size budget of the persistent parse cache
+PARSE_CACHE_DIR = "data/cache"
+PARSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+def content_hash(buffer):
+    """
+    Computes the cache key of a PDF from its raw bytes.
+
+    Parameters:
+    - buffer (bytes-like): Content of the PDF file.
+
+    Returns:
+    - str: Hex SHA-256 digest of the content.
+    """
+    return hashlib.sha256(buffer).hexdigest()
+
+class ParseCache:
+    """
+    Persistent cache of parsed ticket rows keyed by the PDF content hash.
+
+    Entries live in one JSON file per ticket under a directory named after the
+    parser version, so bumping the parser or the category keywords invalidates
+    every previous entry. The cache is bounded by total size on disk and evicts
+    the least recently used entries first.
+    """
+
+    def __init__(self, version, cache_dir=PARSE_CACHE_DIR, max_bytes=PARSE_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.version_dir = os.path.join(cache_dir, version)
+        os.makedirs(self.version_dir, exist_ok=True)
+
+        # Drop entries written by other parser versions
+        for entry in os.scandir(cache_dir):
+            if entry.is_dir() and entry.path != self.version_dir:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def _entry_path(self, digest):
+        return os.path.join(self.version_dir, f"{digest}.json")
+
+    def get(self, digest):
+        """
+        Returns the cached rows of a ticket, or None when it was never parsed.
+        """
+        path = self._entry_path(digest)
+        try:
+            with open(path, encoding="utf-8") as f:
+                rows = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Refresh the access time used by the LRU eviction
+        os.utime(path)
+        return rows
+
+    def put(self, digest, rows):
+        """
+        Stores the parsed rows of a ticket.
+        """
+        with transactions.atomic_file(self._entry_path(digest), "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False)
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits in max_bytes.
+        """
+        entries = []
+        total = 0
+        for entry in os.scandir(self.version_dir):
+            # Skip entries still being written by another process
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
@@ -1,12 +1,50 @@
+import hashlib
+import io
+import json
 import os
 import pandas as pd
 import pdfplumber
+import pypdfium2 as pdfium
 import re
-import streamlit as st
+import sys
+import rollups
+import sqlite_store
+import storage
+import timing
+import transactions
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from parse_cache import ParseCache, content_hash
 
 # Define paths and file names
 data_path = "data/pdfs"
 output_csv = "data/mercadata.csv"
+output_index = "data/mercadata.index"
+
+# Worker processes used to parse uploaded tickets in parallel
+PARSE_WORKERS = os.cpu_count() or 1
+PARSE_CHUNKSIZE = 4
+
+# Keep a copy of every uploaded PDF under data_path (written in the background)
+ARCHIVE_UPLOADS = True
+_archive_executor = None
+
+# Keep the indexed SQLite copy of the dataset (sqlite_store) in sync at ingest time
+SQLITE_STORE = True
+
+# Bump whenever a parser change alters the extracted rows, so cached parses are discarded
+PARSER_VERSION = 2
+
+# Precompiled patterns of the ticket layout
+FECHA_PATTERN = re.compile(r'(\d{2}/\d{2}/\d{4}\s+\d{2}:\d{2})\s+OP:\s+(\d+)')
+UBICACION_PATTERN = re.compile(r'^(AVDA\.|C\.|CALLE)\s+.*\d+', re.IGNORECASE)
+ITEMS_HEADER_PATTERN = re.compile(r'Descripción\s+P\.\s+Unit\s+Importe', re.IGNORECASE)
+ITEMS_END_PATTERN = re.compile(r'\b(TOTAL|IVA|TARJETA|IMPORTE)\b', re.IGNORECASE)
+QUANTITY_PATTERN = re.compile(r'^(\d+)\s+(.*)')
+PRICE_PATTERN = re.compile(r'(\d+,\d{2})')
+TRAILING_PRICE_PATTERN = re.compile(r'\s*\d+,\d{2}$')
+WEIGHT_PRICE_PATTERN = re.compile(r'^(\d+,\d{3})\s+kg\s+(\d+,\d{2})\s+€/kg\s+(\d+,\d{2})')
+TOTAL_PATTERN = re.compile(r'^TOTAL\s+\(€\)\s+(\d+,\d{2})')
 
 # Define the category keywords
 CATEGORY_KEYWORDS = {
@@ -48,158 +86,783 @@ CATEGORY_KEYWORDS = {
     # Add more categories and keywords as needed
 }
 
+def build_category_matcher(category_keywords):
+    """
+    Compiles the category keywords into a single regex.
+
+    The keywords are grouped by their first character so the regex engine only
+    tries the keywords that can start at each position, and the alternation is
+    wrapped in a lookahead so that findall reports the keyword found at every
+    position of the name. Keywords that start with a shorter keyword of the same
+    or a higher-priority category can never change the result and are dropped;
+    the rest are tried longest first, so the keyword reported at a position is
+    always the highest-priority one starting there.
+
+    Parameters:
+    - category_keywords (dict): Mapping of category name to keyword list.
+
+    Returns:
+    - tuple: The compiled regex and a mapping of keyword to category priority.
+    """
+    ranks = {}
+    for rank, keywords in enumerate(category_keywords.values()):
+        for keyword in keywords:
+            ranks.setdefault(keyword, rank)
+
+    keywords = [keyword for keyword in ranks
+                if not any(other != keyword and keyword.startswith(other) and ranks[other] <= ranks[keyword]
+                           for other in ranks)]
+    branches = {}
+    for keyword in sorted(keywords, key=len, reverse=True):
+        branches.setdefault(keyword[0], []).append(re.escape(keyword[1:]))
+
+    alternation = "|".join(re.escape(first) + "(?:" + "|".join(rests) + ")" for first, rests in branches.items())
+    return re.compile("(?=(" + alternation + "))"), {keyword: ranks[keyword] for keyword in keywords}
+
+CATEGORY_PATTERN, CATEGORY_RANKS = build_category_matcher(CATEGORY_KEYWORDS)
+CATEGORY_NAMES = [category.capitalize() for category in CATEGORY_KEYWORDS]
+
 def categorize_item(item):
     """
     Categorizes an item based on predefined keyword mappings.
 
+    The first category in CATEGORY_KEYWORDS with a keyword contained in the
+    item name wins, regardless of where in the name the keyword appears.
+
     Parameters:
     - item (str): The name of the item to categorize.
 
     Returns:
     - str: The category of the item.
     """
-    item_lower = item.lower()
-    for category, keywords in CATEGORY_KEYWORDS.items():
-        for keyword in keywords:
-            if keyword in item_lower:
-                return category.capitalize()
-    return "Otros"
+    matches = CATEGORY_PATTERN.findall(item.lower())
+    if not matches:
+        return "Otros"
+    return CATEGORY_NAMES[min(CATEGORY_RANKS[keyword] for keyword in matches)]
+
+def categorize_items(items):
+    """
+    Categorizes a whole Series of item names at once.
+
+    Each distinct name is matched only once, which keeps re-categorizing the
+    full history cheap since the same products are bought over and over.
+
+    Parameters:
+    - items (pd.Series): Item names.
+
+    Returns:
+    - pd.Series: The category of every item, aligned with the input.
+    """
+    categories = {item: categorize_item(item) for item in pd.unique(items)}
+    return items.map(categories)
+
+def parse_item_lines(lines, fecha, identificativo, ubicacion):
+    """
+    Parses the item section of a ticket.
+
+    Lines are pulled from the iterator one at a time and the loop stops at the
+    first totals line, so whatever follows it (including later pages) is never
+    read.
 
-def process_pdfs(uploaded_files):
+    Parameters:
+    - lines (iterator): Text lines of the ticket, starting at the first item line.
+    - fecha, identificativo, ubicacion (str): Ticket-level fields copied into every row.
+
+    Returns:
+    - tuple: The item rows and the (stripped) line that ended the section,
+      None when the lines ran out before a totals line.
+    """
     data = []
+    end_line = None
 
-    # Ensure data directory exists
-    data_path = "data"
-    if not os.path.exists(data_path):
-        os.makedirs(data_path)
-
-    for uploaded_file in uploaded_files:
-        pdf_path = os.path.join(data_path, uploaded_file.name)
-        with open(pdf_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-
-        # Initialize variables to store receipt-level information
-        fecha = ""
-        identificativo = ""
-        ubicacion = ""
-
-        # Flags and buffers for multi-line items
-        waiting_for_continuation = False
-        pending_item = {}
-
-        # Process each PDF file
-        with pdfplumber.open(pdf_path) as pdf:
-            page = pdf.pages[0]
-            text = page.extract_text()
+    # Iterate through item lines
+    with timing.stage("item_loop"):
+        line = next(lines, None)
+        while line is not None:
+            line = line.strip()
+            # Line read ahead for a multi-line item and not part of it
+            pending = None
+
+            # Stop processing when reaching totals or other non-item sections
+            if ITEMS_END_PATTERN.search(line):
+                end_line = line
+                break
+
+            # Check if the line starts with a quantity (e.g., "1 ", "2 ")
+            quantity_match = QUANTITY_PATTERN.match(line)
+            if quantity_match:
+                quantity = quantity_match.group(1)
+                rest = quantity_match.group(2)
+
+                # Attempt to extract prices using regex
+                # This regex captures all occurrences of prices in the format "X,XX"
+                price_matches = PRICE_PATTERN.findall(rest)
 
-            if text:
-                lines = text.split('\n')
-
-                # Extract fecha, identificativo de ticket, and ubicacion
-                for line in lines:
-                    # Extract fecha and identificativo
-                    fecha_match = re.search(r'(\d{2}/\d{2}/\d{4}\s+\d{2}:\d{2})\s+OP:\s+(\d+)', line)
-                    if fecha_match:
-                        fecha = fecha_match.group(1)
-                        identificativo = fecha_match.group(2)
-                        continue
-
-                    # Extract ubicacion (assuming it's in lines containing an address)
-                    ubicacion_match = re.search(r'^(AVDA\.|C\.|CALLE)\s+.*\d+', line, re.IGNORECASE)
-                    if ubicacion_match:
-                        ubicacion = line.strip()
-                        continue
-
-                # Identify the start of the items section
-                items_start = False
-                for idx, line in enumerate(lines):
-                    if re.search(r'Descripción\s+P\.\s+Unit\s+Importe', line, re.IGNORECASE):
-                        items_start = True
-                        start_idx = idx + 1
-                        break
-
-                if not items_start:
-                    # If header not found, assume items start after a certain number of lines
-                    start_idx = 5  # Adjust as needed
-
-                # Iterate through item lines
-                idx = start_idx
-                while idx < len(lines):
-                    line = lines[idx].strip()
-
-                    # Stop processing when reaching totals or other non-item sections
-                    if re.search(r'\b(TOTAL|IVA|TARJETA|IMPORTE)\b', line, re.IGNORECASE):
-                        break
-
-                    # Check if the line starts with a quantity (e.g., "1 ", "2 ")
-                    quantity_match = re.match(r'^(\d+)\s+(.*)', line)
-                    if quantity_match:
-                        quantity = quantity_match.group(1)
-                        rest = quantity_match.group(2)
-
-                        # Attempt to extract prices using regex
-                        # This regex captures all occurrences of prices in the format "X,XX"
-                        price_matches = re.findall(r'(\d+,\d{2})', rest)
-
-                        if len(price_matches) >= 2:
-                            # Single-line item with unit and total price
-                            # Assume the last two matches are unit price and total price
-                            precio_total = price_matches[-1].replace(',', '.')
-                            # Extract item name by removing the last two price parts
-                            # This assumes item name does not contain numbers that look like prices
-                            item_name = re.sub(r'\s*\d+,\d{2}$', '', rest).strip()
-                            categoria = categorize_item(item_name)
-                            data.append([fecha, identificativo, ubicacion, item_name, categoria, float(precio_total)])
-                        elif len(price_matches) == 1:
-                            # Single-line item with only total price
-                            # Extract item name by removing the last price
-                            item_name = re.sub(r'\s*\d+,\d{2}$', '', rest).strip()
-                            precio_total = price_matches[0].replace(',', '.')
-                            categoria = categorize_item(item_name)
-                            data.append([fecha, identificativo, ubicacion, item_name, categoria, float(precio_total)])
+                if len(price_matches) >= 2:
+                    # Single-line item with unit and total price
+                    # Assume the last two matches are unit price and total price
+                    precio_total = price_matches[-1].replace(',', '.')
+                    # Extract item name by removing the last two price parts
+                    # This assumes item name does not contain numbers that look like prices
+                    item_name = TRAILING_PRICE_PATTERN.sub('', rest).strip()
+                    data.append([fecha, identificativo, ubicacion, item_name, "", float(precio_total)])
+                elif len(price_matches) == 1:
+                    # Single-line item with only total price
+                    # Extract item name by removing the last price
+                    item_name = TRAILING_PRICE_PATTERN.sub('', rest).strip()
+                    precio_total = price_matches[0].replace(',', '.')
+                    data.append([fecha, identificativo, ubicacion, item_name, "", float(precio_total)])
+                else:
+                    # Possible multi-line item without price on the first line
+                    item_name = rest.strip()
+                    # Look ahead to the next line for weight and price
+                    pending = next(lines, None)
+                    if pending is not None:
+                        next_line = pending.strip()
+                        # Match patterns like "0,474 kg 1,40 €/kg 0,66"
+                        weight_price_match = WEIGHT_PRICE_PATTERN.match(next_line)
+                        if weight_price_match:
+                            precio_total = weight_price_match.group(3).replace(',', '.')
+                            data.append([fecha, identificativo, ubicacion, item_name, "", float(precio_total)])
+                            pending = None  # The next line is part of the current item
                         else:
-                            # Possible multi-line item without price on the first line
-                            item_name = rest.strip()
-                            # Look ahead to the next line for weight and price
-                            if idx + 1 < len(lines):
-                                next_line = lines[idx + 1].strip()
-                                # Match patterns like "0,474 kg 1,40 €/kg 0,66"
-                                weight_price_match = re.match(r'^(\d+,\d{3})\s+kg\s+(\d+,\d{2})\s+€/kg\s+(\d+,\d{2})', next_line)
-                                if weight_price_match:
-                                    precio_total = weight_price_match.group(3).replace(',', '.')
-                                    categoria = categorize_item(item_name)
-                                    data.append([fecha, identificativo, ubicacion, item_name, categoria, float(precio_total)])
-                                    idx += 1  # Skip the next line as it's part of the current item
-                                else:
-                                    # If no weight and price, attempt to find any price in the next line
-                                    next_price_matches = re.findall(r'(\d+,\d{2})', next_line)
-                                    if next_price_matches:
-                                        precio_total = next_price_matches[-1].replace(',', '.')
-                                        categoria = categorize_item(item_name)
-                                        data.append([fecha, identificativo, ubicacion, item_name, categoria, float(precio_total)])
-                                        idx += 1  # Skip the next line as it's part of the current item
-                                    else:
-                                        # If no price information, skip or handle as needed
-                                        pass
-                    else:
-                        # Handle lines that might be continuations of previous items or other formats
-                        # Currently, no specific handling is needed
-                        pass
-
-                    idx += 1
-
-    if data:
-        # Create a DataFrame and save it locally as CSV
-        df = pd.DataFrame(data, columns=["fecha", "identificativo de ticket", "ubicación", "item", "categoría", "precio"])
+                            # If no weight and price, attempt to find any price in the next line
+                            next_price_matches = PRICE_PATTERN.findall(next_line)
+                            if next_price_matches:
+                                precio_total = next_price_matches[-1].replace(',', '.')
+                                data.append([fecha, identificativo, ubicacion, item_name, "", float(precio_total)])
+                                pending = None  # The next line is part of the current item
+                            else:
+                                # If no price information, skip or handle as needed
+                                pass
+            else:
+                # Handle lines that might be continuations of previous items or other formats
+                # Currently, no specific handling is needed
+                pass
+
+            line = pending if pending is not None else next(lines, None)
+
+    # Categorize once the section is parsed, so the item loop and the matcher are timed apart
+    with timing.stage("categorize"):
+        for row in data:
+            row[4] = categorize_item(row[3])
+
+    return data, end_line
+
+def scan_header(lines):
+    """
+    Reads the ticket header up to the "Descripción P. Unit Importe" line.
+
+    Parameters:
+    - lines (iterator): Text lines of the ticket. On return it is positioned
+      at the first item line.
+
+    Returns:
+    - tuple: (fecha, identificativo, ubicacion, header_lines), where
+      header_lines holds the lines read when no item header was found (the
+      whole text) and is None otherwise.
+    """
+    fecha = ""
+    identificativo = ""
+    ubicacion = ""
+    header_lines = []
+
+    with timing.stage("header_scan"):
+        for line in lines:
+            if ITEMS_HEADER_PATTERN.search(line):
+                return fecha, identificativo, ubicacion, None
+            header_lines.append(line)
+
+            # Extract fecha and identificativo
+            fecha_match = FECHA_PATTERN.search(line)
+            if fecha_match:
+                fecha = fecha_match.group(1)
+                identificativo = fecha_match.group(2)
+                continue
+
+            # Extract ubicacion (assuming it's in lines containing an address)
+            ubicacion_match = UBICACION_PATTERN.search(line)
+            if ubicacion_match:
+                ubicacion = line.strip()
+
+    return fecha, identificativo, ubicacion, header_lines
+
+def pdf_input(pdf_file):
+    """
+    Prepares a PDF given as a path, bytes or binary file object for pdfplumber
+    and pdfium without copying it to disk.
+
+    Parameters:
+    - pdf_file (str, bytes or file-like): The ticket PDF.
+
+    Returns:
+    - The path unchanged, or a binary stream positioned at the start.
+    """
+    if isinstance(pdf_file, (str, os.PathLike)):
+        return pdf_file
+    if isinstance(pdf_file, (bytes, bytearray, memoryview)):
+        # BytesIO shares the memory of a bytes object until it is written to
+        return io.BytesIO(pdf_file)
+    pdf_file.seek(0)
+    return pdf_file
+
+def pdf_bytes(pdf_file):
+    """
+    Returns the content of a PDF given as a path, bytes or binary file object.
+
+    For BytesIO-based objects such as Streamlit's UploadedFile, getvalue()
+    returns the underlying buffer without copying it.
+    """
+    if isinstance(pdf_file, (str, os.PathLike)):
+        with open(pdf_file, "rb") as f:
+            return f.read()
+    if isinstance(pdf_file, (bytes, bytearray, memoryview)):
+        return pdf_file
+    if hasattr(pdf_file, "getvalue"):
+        return pdf_file.getvalue()
+    pdf_file.seek(0)
+    return pdf_file.read()
+
+def pdfplumber_lines(pdf):
+    """
+    Yields the text lines of every page of a pdfplumber document, extracting
+    each page only when the previous one has been consumed.
+    """
+    for page in pdf.pages:
+        with timing.stage("extract_text"):
+            text = page.extract_text()
+        if text:
+            yield from text.split('\n')
+
+def pdfium_lines(pdf):
+    """
+    Yields the text lines of every page of a pdfium document, extracting each
+    page only when the previous one has been consumed.
+    """
+    for index in range(len(pdf)):
+        with timing.stage("extract_text"):
+            text = pdf[index].get_textpage().get_text_bounded()
+        yield from text.splitlines()
+
+def parse_pdf(pdf_file):
+    """
+    Extracts the item rows of a single Mercadona ticket.
+
+    This is the generic path: it relies on pdfplumber's layout analysis and
+    tolerates tickets that do not follow the usual template. Pages are read
+    lazily, in a single pass, until the totals block is reached, so items
+    spilling onto later pages are included.
+
+    Parameters:
+    - pdf_file (str, bytes or file-like): Path to the ticket PDF or its content.
+
+    Returns:
+    - list: One [fecha, identificativo, ubicacion, item, categoria, precio] row per item.
+    """
+    # Process each PDF file
+    with timing.stage("pdf_open"):
+        pdf = pdfplumber.open(pdf_input(pdf_file))
+    with pdf:
+        lines = pdfplumber_lines(pdf)
+        fecha, identificativo, ubicacion, header_lines = scan_header(lines)
+        if header_lines is not None:
+            # If header not found, assume items start after a certain number of lines
+            lines = iter(header_lines[5:])  # Adjust as needed
+        data, _ = parse_item_lines(lines, fecha, identificativo, ubicacion)
+
+    return data
+
+def parse_ticket_lines(lines):
+    """
+    Parses the lines of a ticket that follows the usual Mercadona template in
+    a single pass.
+
+    The header fields must all appear before the "Descripción P. Unit Importe"
+    line, and the items must add up to the amount of the "TOTAL (€)" line that
+    ends the item section. Anything else is reported as a template mismatch.
+
+    Parameters:
+    - lines (iterable): Text lines of the ticket, possibly produced lazily.
+
+    Returns:
+    - list: The item rows, or None when the lines do not match the template.
+    """
+    lines = iter(lines)
+    fecha, identificativo, ubicacion, header_lines = scan_header(lines)
+    if header_lines is not None or not (fecha and identificativo and ubicacion):
+        return None
+
+    data, end_line = parse_item_lines(lines, fecha, identificativo, ubicacion)
+    total_match = TOTAL_PATTERN.match(end_line) if end_line is not None else None
+    if not data or not total_match:
+        return None
+    if round(sum(row[5] for row in data), 2) != float(total_match.group(1).replace(',', '.')):
+        return None
+    return data
+
+def parse_ticket_text(text):
+    """
+    Parses the full text of a ticket with parse_ticket_lines.
+    """
+    return parse_ticket_lines(text.splitlines())
+
+def parse_ticket(pdf_file):
+    """
+    Extracts the item rows of a single Mercadona ticket, using the fast path
+    when possible.
+
+    The fast path reads the character stream of each page with pdfium,
+    skipping pdfplumber's layout analysis, and parses it with
+    parse_ticket_lines, stopping at the totals block. Tickets that do not
+    match the template are parsed again with the generic parse_pdf.
+
+    Parameters:
+    - pdf_file (str, bytes or file-like): Path to the ticket PDF or its content.
+
+    Returns:
+    - list: One [fecha, identificativo, ubicacion, item, categoria, precio] row per item.
+    """
+    try:
+        with timing.stage("pdf_open"):
+            pdf = pdfium.PdfDocument(pdf_input(pdf_file))
+        try:
+            data = parse_ticket_lines(pdfium_lines(pdf))
+        finally:
+            pdf.close()
+    except pdfium.PdfiumError:
+        data = None
+
+    if data is None:
+        with timing.stage("fallback"):
+            data = parse_pdf(pdf_file)
+    return data
+
+def parser_version():
+    """
+    Identifies the current parser and keyword set, used to invalidate cached parses.
+
+    Returns:
+    - str: Short hash of PARSER_VERSION and CATEGORY_KEYWORDS.
+    """
+    payload = json.dumps([PARSER_VERSION, CATEGORY_KEYWORDS], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+def ticket_key(identificativo, fecha):
+    """
+    Builds the deduplication key of a ticket.
+
+    Parameters:
+    - identificativo (str): Ticket identifier (the OP: number).
+    - fecha (str): Ticket date as printed on the ticket ("dd/mm/YYYY HH:MM").
+
+    Returns:
+    - str: The key stored in the ingested-tickets index.
+    """
+    return f"{identificativo}|{fecha}"
+
+def load_ingested_keys():
+    """
+    Loads the keys of the tickets already present in the output CSV.
+
+    The keys are read from the on-disk index written next to the CSV. When the
+    index is missing but the CSV exists (e.g. a dataset created before the index
+    was introduced) it is rebuilt once from the CSV.
+
+    Returns:
+    - set: Keys built with ticket_key.
+    """
+    if os.path.exists(output_index):
+        with open(output_index, encoding="utf-8") as f:
+            return {line.rstrip("\n") for line in f if line.strip()}
+
+    if not os.path.exists(output_csv) or os.path.getsize(output_csv) == 0:
+        return set()
+
+    tickets = pd.read_csv(output_csv, usecols=["fecha", "identificativo de ticket"], dtype=str).drop_duplicates()
+    keys = [ticket_key(identificativo, fecha)
+            for fecha, identificativo in tickets.itertuples(index=False)]
+    with transactions.atomic_file(output_index, "w", encoding="utf-8") as f:
+        f.writelines(f"{key}\n" for key in keys)
+    return set(keys)
+
+def _ticket_error(rows):
+    """
+    Checks that parsed rows can be stored, i.e. that the ticket date was found.
+
+    Returns:
+    - str: Error message for the ticket, or None when the rows are valid.
+    """
+    if rows and pd.isna(pd.to_datetime(rows[0][0], format=storage.DATE_FORMAT, errors="coerce")):
+        return f"ValueError: ticket date not found or invalid ({rows[0][0]!r})"
+    return None
+
+def _parse_file(parser, named_file):
+    """
+    Runs the parser on one (name, pdf_file) pair, returning the error instead
+    of raising so a broken PDF does not abort a whole batch, together with the
+    stage timings of the ticket (collected here so they survive the trip back
+    from a worker process).
+    """
+    name, pdf_file = named_file
+    log = timing.TimingLog(run="")
+    with timing.collecting(log, scope="ticket", name=name):
+        try:
+            return parser(pdf_file), None, log.records
+        except Exception as e:
+            return None, f"{type(e).__name__}: {e}", log.records
+
+def pdf_name(pdf_file):
+    """
+    Returns a printable name for a PDF given as a path, bytes or file object.
+    """
+    if isinstance(pdf_file, (str, os.PathLike)):
+        return os.fspath(pdf_file)
+    return getattr(pdf_file, "name", "<memoria>")
+
+def ingest_pdfs(pdf_files, workers=PARSE_WORKERS, use_cache=True, incremental=False, fast=True, progress=None):
+    """
+    Parses ticket PDFs and writes the resulting rows to the output CSV, the
+    columnar store, the rollups and, with SQLITE_STORE, the SQLite database.
+    This is the UI-independent core shared by the Streamlit app and the
+    command line (ingest.py).
+
+    Parsing runs concurrently with other ingests; the write happens under the
+    dataset lock (see commit_rows), so concurrent ingests are serialized and
+    never add the same ticket twice.
+
+    Parameters:
+    - pdf_files (list): PDF files to ingest, as paths or in memory (bytes or
+      binary file objects such as Streamlit's UploadedFile). In-memory files
+      are parsed straight from their buffer, never written to disk.
+    - workers (int): Number of worker processes used to parse the PDFs. With 1 the
+      files are parsed sequentially in the current process.
+    - use_cache (bool): Reuse the rows of tickets already parsed with the same
+      content, parser and keywords instead of parsing them again.
+    - incremental (bool): Append only the tickets not yet in the output CSV
+      instead of overwriting it with the current batch.
+    - fast (bool): Try the template-aware fast extraction (parse_ticket) before
+      the generic pdfplumber path.
+    - progress (callable): Called as progress(done, total, name, error) after
+      each file is parsed or found in the cache; error is the parse error
+      message (see errors below) or None.
+
+    Returns:
+    - dict: files (number of files), new_tickets (tickets written), rows (the
+      written rows as a DataFrame, None when nothing was written), errors
+      (list of (name, message) for the files that could not be parsed or
+      have no ticket date) and timings (timing.TimingLog with per-ticket and per-stage durations).
+    """
+    data = []
+    errors = []
+    log = timing.TimingLog()
+    total = len(pdf_files)
+    done = 0
+
+    # Ensure data directory exists
+    output_dir = os.path.dirname(output_csv)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    cache = ParseCache(parser_version()) if use_cache else None
+    parallel = workers > 1 and total > 1
+
+    # Rows per file, filled from the cache or by the parser
+    results = [None] * total
+    pending = []
+    with log.stage("cache_lookup", scope="ingest"):
+        for i, pdf_file in enumerate(pdf_files):
+            digest = None
+            if cache:
+                digest = content_hash(pdf_bytes(pdf_file))
+                results[i] = cache.get(digest)
+            if results[i] is None:
+                # Worker processes receive in-memory files as plain bytes
+                if parallel and not isinstance(pdf_file, (str, os.PathLike)):
+                    pending.append((i, pdf_name(pdf_file), bytes(pdf_bytes(pdf_file)), digest))
+                else:
+                    pending.append((i, pdf_name(pdf_file), pdf_file, digest))
+            else:
+                error = _ticket_error(results[i])
+                if error is not None:
+                    errors.append((pdf_name(pdf_file), error))
+                    results[i] = []
+                done += 1
+                if progress:
+                    progress(done, total, pdf_name(pdf_file), error)
+
+    # Parse each PDF file; map() yields results in input order, so the output
+    # is identical to the sequential path regardless of the worker count
+    pending_files = [(name, pdf_file) for _, name, pdf_file, _ in pending]
+    parse = partial(_parse_file, parse_ticket if fast else parse_pdf)
+    if parallel and len(pending_files) > 1:
+        executor = ProcessPoolExecutor(max_workers=min(workers, len(pending_files)))
+        parsed = executor.map(parse, pending_files, chunksize=PARSE_CHUNKSIZE)
+    else:
+        executor = None
+        parsed = map(parse, pending_files)
+
+    try:
+        with log.stage("parse", scope="ingest"):
+            for (i, name, _, digest), (rows, error, records) in zip(pending, parsed):
+                log.extend(records)
+                if error is None:
+                    if cache:
+                        cache.put(digest, rows)
+                    # Rows without a date cannot be stored; reject the ticket
+                    # before its key reaches the index
+                    error = _ticket_error(rows)
+                if error is not None:
+                    errors.append((name, error))
+                    rows = []
+                results[i] = rows
+                done += 1
+                if progress:
+                    progress(done, total, name, error)
+    finally:
+        if executor:
+            executor.shutdown()
+    if cache and pending:
+        cache.evict()
+
+    # Writers are serialized; the batch is de-duplicated against the dataset as
+    # it is when the lock is acquired, so concurrent ingests of the same
+    # tickets add them only once
+    df = None
+    new_keys = []
+    with transactions.exclusive_lock():
+        recover_interrupted_commit()
+
+        ingested = load_ingested_keys() if incremental else set()
+        for rows in results:
+            if rows:
+                # Every row of a ticket shares its fecha and identificativo
+                key = ticket_key(rows[0][1], rows[0][0])
+                if key in ingested:
+                    continue
+                ingested.add(key)
+                new_keys.append(key)
+            data.extend(rows)
+
+        if data:
+            df = pd.DataFrame(data, columns=["fecha", "identificativo de ticket", "ubicación", "item", "categoría", "precio"])
+            commit_rows(df, new_keys, incremental, log)
+
+    return {"files": total, "new_tickets": len(new_keys), "rows": df, "errors": errors, "timings": log}
+
+def commit_rows(df, new_keys, incremental, log):
+    """
+    Writes a batch of new rows to the CSV, its index, the columnar store, the
+    rollups and the SQLite database. Must be called with the dataset lock held.
+
+    The CSV and index changes are recorded in the journal first and appended
+    in place, so a commit costs the size of the batch, not of the history. If
+    the process dies half way, recover_interrupted_commit() truncates both
+    files to their journaled sizes, appends again and rebuilds the derived
+    stores. Readers use the store and SQLite, never the CSV.
+
+    Parameters:
+    - df (pd.DataFrame): Rows to write.
+    - new_keys (list): Keys of the tickets in df.
+    - incremental (bool): Append to the dataset instead of replacing it.
+    - log (timing.TimingLog): Receives the duration of every write.
+    """
+    if incremental:
+        # Bring the columnar store up to date with the existing history first
+        storage.ensure_store(output_csv)
+        rollups.ensure_rollups()
+        if SQLITE_STORE:
+            sqlite_store.ensure_database()
+
+    with log.stage("csv_write", scope="ingest"):
+        csv_size = transactions.file_size(output_csv) if incremental else 0
+        entry = {
+            "csv_size": csv_size,
+            # The header is written when the file is created
+            "csv": df.to_csv(index=False, header=csv_size == 0),
+            "index_size": transactions.file_size(output_index) if incremental else 0,
+            "index": "".join(f"{key}\n" for key in new_keys),
+        }
+        transactions.write_journal(entry)
+        _apply_journal(entry)
+
+    if incremental:
+        with log.stage("store_write", scope="ingest"):
+            storage.append_partitions(df)
+        with log.stage("rollups_write", scope="ingest"):
+            rollups.update_rollups(df)
+        if SQLITE_STORE:
+            with log.stage("sqlite_write", scope="ingest"):
+                sqlite_store.append_rows(df, storage.dataset_version())
+    else:
+        with log.stage("store_write", scope="ingest"):
+            storage.write_partitions(df)
+        with log.stage("rollups_write", scope="ingest"):
+            rollups.rebuild_rollups(df)
+        if SQLITE_STORE:
+            with log.stage("sqlite_write", scope="ingest"):
+                sqlite_store.write_rows(df, storage.dataset_version())
+
+    transactions.clear_journal()
+
+def _apply_journal(entry):
+    transactions.write_at(output_csv, entry["csv_size"], entry["csv"].encode("utf-8"))
+    transactions.write_at(output_index, entry["index_size"], entry["index"].encode("utf-8"))
+
+def recover_interrupted_commit():
+    """
+    Completes a commit that was interrupted, as recorded in the journal. Must
+    be called with the dataset lock held.
+
+    The CSV and index are truncated to their journaled sizes and appended
+    again, which is idempotent, and the store, rollups and SQLite database are
+    rebuilt from the CSV since it is unknown which of them were already updated.
+
+    Returns:
+    - bool: Whether there was a commit to recover.
+    """
+    entry = transactions.read_journal()
+    if entry is None:
+        return False
+    _apply_journal(entry)
+    storage.import_csv(output_csv)
+    rollups.rebuild_rollups(storage.read_dataset())
+    if SQLITE_STORE:
+        sqlite_store.ensure_database()
+    transactions.clear_journal()
+    return True
+
+def ensure_dataset(sqlite=SQLITE_STORE):
+    """
+    Makes sure the columnar store, the rollups and optionally the SQLite
+    database exist and are in sync, for readers such as the dashboard.
+
+    Everything is checked without locking. The lock is only tried when
+    something has to be built or recovered, and without waiting: if a writer
+    holds it, the reader goes on with the files as they are. Every file is
+    replaced atomically, so they are always complete, and the writer brings
+    them up to date when it finishes.
+
+    Returns:
+    - bool: Whether the dataset holds any data.
+    """
+    def in_sync():
+        return (transactions.read_journal() is None
+                and bool(storage.list_months())
+                and not rollups.missing_rollups()
+                and (not sqlite or sqlite_store.source_version() == storage.dataset_version()))
+
+    if not in_sync():
+        with transactions.exclusive_lock(blocking=False) as locked:
+            if locked:
+                recover_interrupted_commit()
+                if storage.ensure_store(output_csv):
+                    rollups.ensure_rollups()
+                    if sqlite:
+                        sqlite_store.ensure_database()
+    return bool(storage.list_months())
+
+def archive_pdf(name, content):
+    """
+    Saves a copy of an uploaded PDF under data_path in a background thread.
+
+    Parameters:
+    - name (str): File name of the upload.
+    - content (bytes): Content of the PDF.
+
+    Returns:
+    - concurrent.futures.Future: Completes once the file is written; a failed
+      write is also logged to stderr (see archive_errors to report it).
+    """
+    global _archive_executor
+    if _archive_executor is None:
+        _archive_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="archive")
+
+    def write():
+        with transactions.atomic_file(os.path.join(data_path, os.path.basename(name))) as f:
+            f.write(content)
+
+    def log_error(future):
+        error = future.exception()
+        if error is not None:
+            print(f"error: could not archive {name}: {type(error).__name__}: {error}", file=sys.stderr)
+
+    future = _archive_executor.submit(write)
+    future.add_done_callback(log_error)
+    return future
+
+def archive_errors(archived):
+    """
+    Waits for the copies started with archive_pdf.
+
+    Parameters:
+    - archived (list): (name, future) pairs as returned by archive_pdf.
+
+    Returns:
+    - list: (name, message) for the copies that could not be written.
+    """
+    errors = []
+    for name, future in archived:
+        error = future.exception()
+        if error is not None:
+            errors.append((name, f"{type(error).__name__}: {error}"))
+    return errors
+
+def process_pdfs(uploaded_files, workers=PARSE_WORKERS, use_cache=True, incremental=False, fast=True,
+                 archive=ARCHIVE_UPLOADS):
+    """
+    Parses the uploaded tickets and writes the resulting rows to the output CSV,
+    reporting the outcome in the Streamlit page.
+
+    The uploads are parsed from memory; keeping a copy of the PDFs is optional
+    and happens in the background.
+
+    Parameters:
+    - uploaded_files (list): Uploaded PDF files (Streamlit UploadedFile objects).
+    - workers, use_cache, incremental, fast: See ingest_pdfs.
+    - archive (bool): Also save the uploaded PDFs under data_path.
+
+    Returns:
+    - dict: The result of ingest_pdfs, including its stage timings, plus
+      archive_errors (list of (name, message) for the copies that failed).
+    """
+    archived = []
+    if archive:
+        for uploaded_file in uploaded_files:
+            archived.append((uploaded_file.name, archive_pdf(uploaded_file.name, pdf_bytes(uploaded_file))))
+
+    result = ingest_pdfs(uploaded_files, workers=workers, use_cache=use_cache, incremental=incremental, fast=fast)
+    result["archive_errors"] = archive_errors(archived)
+    show_ingest_result(result, incremental)
+    return result
+
+def show_ingest_result(result, incremental):
+    """
+    Reports the outcome of ingest_pdfs in the Streamlit page.
+    """
+    import streamlit as st
+
+    for name, error in result["errors"]:
+        st.warning(f"No se pudo procesar {os.path.basename(name)}: {error}")
+    for name, error in result.get("archive_errors", []):
+        st.warning(f"No se pudo guardar una copia de {os.path.basename(name)}: {error}")
+
+    df = result["rows"]
+    if df is not None:
         print(df)
         print(df.loc[df["categoría"] == "Otros"])
-        df.to_csv(output_csv, index=False)
-        st.success(f"Archivo CSV generado con éxito: {output_csv}")
+        if incremental:
+            st.success(f"{result['new_tickets']} ticket(s) nuevos añadidos a {output_csv}")
+        else:
+            st.success(f"Archivo CSV generado con éxito: {output_csv}")
+    elif incremental and len(result["errors"]) < result["files"]:
+        st.info("Todos los tickets ya estaban incluidos en el archivo CSV.")
     else:
         st.info("No se encontraron datos para escribir en el archivo CSV.")
 
 
 def main():
+    import streamlit as st
+
     st.title("Procesador de Tickets PDF")
 
     # Permitir a los usuarios subir archivos PDF
@@ -0,0 +1,164 @@
+import math
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+import streamlit as st
+import rollups
+import timing
+
+# Rows of a raw-row table sent to the browser at a time
+TABLE_PAGE_SIZE = 200
+
+# Maximum number of points of a time series chart; longer series are merged into coarser buckets
+MAX_CHART_POINTS = 400
+
+def downsample_sum(df, x, y, max_points=MAX_CHART_POINTS):
+    """
+    Caps an additive series (e.g. spend per week) at max_points points.
+
+    Consecutive points are merged into equally sized buckets labelled with
+    their last x and holding the sum of their y, so the total is preserved.
+    Series already within the limit are returned unchanged.
+
+    Parameters:
+    - df (pd.DataFrame): The series, ordered by x.
+    - x, y (str): Label and value columns.
+
+    Returns:
+    - pd.DataFrame: At most max_points rows with the x and y columns.
+    """
+    if len(df) <= max_points:
+        return df
+    bucket = math.ceil(len(df) / max_points)
+    return df.groupby(np.arange(len(df)) // bucket).agg({x: "last", y: "sum"}).reset_index(drop=True)
+
+def paginated_dataframe(total, fetch, key, page_size=TABLE_PAGE_SIZE):
+    """
+    Shows a raw-row table one page at a time, so only page_size rows are sent
+    to the browser however many rows match.
+
+    Parameters:
+    - total (int): Number of rows of the table.
+    - fetch (callable): fetch(offset, limit) returns the rows of a page.
+    - key (str): Widget key of the page selector; use one per filter choice
+      so every choice starts on its first page.
+    """
+    pages = max(1, math.ceil(total / page_size))
+    page = 1
+    if pages > 1:
+        page = st.number_input(f"Página (de {pages})", min_value=1, max_value=pages, value=1, step=1, key=key)
+    offset = (page - 1) * page_size
+    st.dataframe(fetch(offset, page_size))
+    if total:
+        st.caption(f"Filas {offset + 1}-{min(offset + page_size, total)} de {total}")
+
+def summary_metrics(tables):
+    """
+    Computes the dashboard's overall KPIs from the rollups.
+
+    Returns:
+    - dict: total_spent, total_purchases, avg_spent_per_purchase,
+      category_with_highest_spent, total_items_sold, avg_spent_per_month and
+      items_per_month.
+    """
+    totals_per_category = rollups.category_totals(tables)
+    total_spent = totals_per_category["precio"].sum()
+    total_purchases = rollups.ticket_count(tables)
+    return {
+        "total_spent": total_spent,
+        "total_purchases": total_purchases,
+        "avg_spent_per_purchase": total_spent / total_purchases,
+        "category_with_highest_spent": totals_per_category["precio"].idxmax(),
+        "total_items_sold": len(tables["items"]),
+        "avg_spent_per_month": rollups.monthly_totals(tables).mean(),
+        "items_per_month": tables["month_category"].groupby("mes")["items"].sum().mean(),
+    }
+
+def build_figures(tables, max_points=MAX_CHART_POINTS):
+    """
+    Builds every chart of the dashboard from the rollups.
+
+    Every aggregation and every figure build is timed with timing.stage()
+    (aggregate_* and figure_* stages), so the durations are recorded when the
+    caller is collecting them.
+
+    Parameters:
+    - tables (dict): Rollups as returned by rollups.load_rollups().
+    - max_points (int): Cap of the time series (see downsample_sum), so the
+      figures do not grow with the length of the history.
+
+    Returns:
+    - dict: Chart name to figure dict (the JSON form of the figure).
+    """
+    figures = {}
+
+    # Distribución del Gasto por Categoría
+    with timing.stage("aggregate_category"):
+        totals_per_category = rollups.category_totals(tables)
+        total_price_per_category = totals_per_category["precio"].reset_index()
+    with timing.stage("figure_pie"):
+        fig_pie = px.pie(total_price_per_category, values='precio', names='categoría', title='Distribución del Gasto por Categoría')
+        figures["pie"] = fig_pie.to_dict()
+
+    # Gasto Total por Mes
+    with timing.stage("aggregate_monthly"):
+        monthly_expense = downsample_sum(rollups.monthly_totals(tables).reset_index(), 'fecha', 'precio', max_points)
+    with timing.stage("figure_monthly"):
+        fig_bar = px.bar(monthly_expense, x='fecha', y='precio', labels={'fecha': 'Mes', 'precio': 'Gasto (€)'})
+        figures["monthly"] = fig_bar.to_dict()
+
+    # Precio Medio por Categoría
+    with timing.stage("aggregate_avg_price"):
+        avg_price_per_category = (totals_per_category["precio"] / totals_per_category["items"]).rename("precio").reset_index().sort_values(by="precio", ascending=False)
+    with timing.stage("figure_avg_price"):
+        fig_bar_avg = px.bar(avg_price_per_category, x='categoría', y='precio', labels={'precio': 'Precio Medio (€)'})
+        figures["avg_price"] = fig_bar_avg.to_dict()
+
+    # Gasto Total por Semana
+    with timing.stage("aggregate_weekly"):
+        weekly_expense = downsample_sum(rollups.weekly_totals(tables).reset_index(), 'fecha', 'precio', max_points)
+    with timing.stage("figure_weekly"):
+        fig_weekly_bar = px.bar(
+            weekly_expense,
+            x='fecha',
+            y='precio',
+            labels={'fecha': 'Semana', 'precio': 'Gasto (€)'},
+            title='Gasto Total por Semana'
+        )
+        fig_weekly_bar.update_layout(xaxis_title='Semana', yaxis_title='Gasto (€)')
+        figures["weekly"] = fig_weekly_bar.to_dict()
+
+    # Top 10 Items con Mayor Gasto
+    with timing.stage("aggregate_top_items"):
+        top_items = tables["items"].set_index("item")["precio"].nlargest(10).reset_index()
+    with timing.stage("figure_top_items"):
+        fig_top_items = px.bar(top_items, x='item', y='precio', labels={'item': 'Item', 'precio': 'Gasto (€)'},
+                               title='Top 10 Items con Mayor Gasto')
+        figures["top_items"] = fig_top_items.to_dict()
+
+    # Limit the heatmap to the opening hours (9 to 22) and every day of the week
+    hours = list(range(9, 23))
+    days = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+    with timing.stage("aggregate_heatmap"):
+        heatmap_data = rollups.heatmap_grid(tables, hours)
+
+    with timing.stage("figure_heatmap"):
+        # Create the heatmap
+        fig_heatmap = go.Figure(
+            data=go.Heatmap(
+                z=heatmap_data.values,
+                x=days,  # Day names
+                y=hours,  # Limited to 9-23
+                colorscale='Viridis'
+            )
+        )
+
+        # Update layout
+        fig_heatmap.update_layout(
+            xaxis_title='Día de la Semana',
+            yaxis_title='Hora del Día',
+            yaxis=dict(dtick=1)  # Ensure ticks for every hour
+        )
+        figures["heatmap"] = fig_heatmap.to_dict()
+
+    return figures
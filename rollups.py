@@ -0,0 +1,176 @@
+import os
+import pandas as pd
+import storage
+import transactions
+
+# Directory of the pre-aggregated tables used by the dashboard
+rollups_path = "data/rollups"
+
+# Grouping keys of every rollup; all the other columns are additive counters
+ROLLUP_KEYS = {
+    "month_category": ["mes", "categoría"],
+    "month_tickets": ["mes"],
+    "weekly": ["semana"],
+    "items": ["item"],
+    "heatmap": ["day_of_week", "hour_of_day"],
+}
+
+def compute_rollups(df):
+    """
+    Aggregates ticket rows into the dashboard rollups.
+
+    Parameters:
+    - df (pd.DataFrame): Ticket rows, raw or typed (see storage.to_typed).
+
+    Returns:
+    - dict: Rollup name to DataFrame, keyed as described in ROLLUP_KEYS.
+      month_category holds the spend and item count per month and category,
+      month_tickets the number of tickets per month, weekly the spend per week
+      (labelled with the closing Sunday, as resample('W') does), items the
+      spend per item and heatmap the spend per weekday and hour.
+    """
+    df = storage.to_typed(df)
+    fecha = df["fecha"]
+    mes = fecha.dt.strftime("%Y-%m")
+    categorias = df["categoría"].astype(str)
+
+    return {
+        "month_category": df.groupby([mes.rename("mes"), categorias])["precio"]
+                            .agg(precio="sum", items="size").reset_index(),
+        # A ticket is an identificativo and fecha pair (see process_data.ticket_key),
+        # which keeps the count additive across batches
+        "month_tickets": df.assign(mes=mes).drop_duplicates(["identificativo de ticket", "fecha"])
+                           .groupby("mes").size().rename("tickets").reset_index(),
+        "weekly": df.groupby(fecha.dt.to_period("W-SUN").dt.end_time.dt.normalize().rename("semana"))["precio"]
+                    .sum().reset_index(),
+        "items": df.groupby("item")["precio"].sum().reset_index(),
+        "heatmap": df.groupby([fecha.dt.dayofweek.rename("day_of_week"), fecha.dt.hour.rename("hour_of_day")])["precio"]
+                     .sum().reset_index(),
+    }
+
+def merge_rollups(current, batch):
+    """
+    Adds the rollups of a new batch of tickets to the existing ones.
+
+    Every counter is additive as long as the batch only holds tickets that are
+    not yet part of the current rollups, which incremental ingestion guarantees.
+    """
+    merged = {}
+    for name, keys in ROLLUP_KEYS.items():
+        if name not in current or current[name].empty:
+            merged[name] = batch[name]
+            continue
+        merged[name] = pd.concat([current[name], batch[name]], ignore_index=True).groupby(keys, as_index=False).sum()
+    return merged
+
+def save_rollups(tables, root=rollups_path):
+    """
+    Writes the rollups, replacing each table atomically.
+    """
+    for name, table in tables.items():
+        with transactions.atomic_file(os.path.join(root, f"{name}.parquet")) as f:
+            table.to_parquet(f, index=False)
+
+def load_rollups(root=rollups_path):
+    """
+    Reads the stored rollups.
+
+    Returns:
+    - dict: Rollup name to DataFrame; empty when the rollups were never built.
+    """
+    tables = {}
+    for name in ROLLUP_KEYS:
+        path = os.path.join(root, f"{name}.parquet")
+        if os.path.exists(path):
+            tables[name] = pd.read_parquet(path)
+    return tables
+
+def rebuild_rollups(df, root=rollups_path):
+    """
+    Replaces the rollups with the aggregates of the given rows.
+    """
+    save_rollups(compute_rollups(df), root)
+
+def missing_rollups(root=rollups_path):
+    """
+    Lists the rollups that were never built, checking only for their files.
+    """
+    return [name for name in ROLLUP_KEYS if not os.path.exists(os.path.join(root, f"{name}.parquet"))]
+
+def ensure_rollups(root=rollups_path, store_root=storage.store_path):
+    """
+    Builds the rollups from the columnar store if they are missing.
+    """
+    if missing_rollups(root):
+        rebuild_rollups(storage.read_dataset(store_root), root)
+
+def update_rollups(df, root=rollups_path):
+    """
+    Folds a batch of new ticket rows into the stored rollups.
+    """
+    save_rollups(merge_rollups(load_rollups(root), compute_rollups(df)), root)
+
+def monthly_totals(tables):
+    """
+    Spend per month, labelled with the last day of the month.
+
+    Months without purchases between the first and the last one are included
+    with zero spend, as resample('M') would do.
+
+    Returns:
+    - pd.Series: Spend indexed by fecha.
+    """
+    totals = tables["month_category"].groupby("mes")["precio"].sum()
+    months = pd.PeriodIndex(totals.index, freq="M")
+    totals.index = months
+    totals = totals.reindex(pd.period_range(months.min(), months.max(), freq="M"), fill_value=0)
+    totals.index = totals.index.to_timestamp(how="end").normalize()
+    return totals.rename_axis("fecha")
+
+def weekly_totals(tables):
+    """
+    Spend per week, labelled with the closing Sunday and including empty weeks.
+
+    Returns:
+    - pd.Series: Spend indexed by fecha.
+    """
+    totals = tables["weekly"].set_index("semana")["precio"].sort_index()
+    weeks = pd.date_range(totals.index.min(), totals.index.max(), freq="W-SUN")
+    return totals.reindex(weeks, fill_value=0).rename_axis("fecha")
+
+def category_totals(tables, month=None):
+    """
+    Spend and number of items per category, optionally for a single month.
+
+    Returns:
+    - pd.DataFrame: precio and items columns indexed by categoría.
+    """
+    month_category = tables["month_category"]
+    if month is not None:
+        month_category = month_category[month_category["mes"] == month]
+    return month_category.groupby("categoría")[["precio", "items"]].sum()
+
+def ticket_count(tables, month=None):
+    """
+    Number of tickets (distinct identificativo and fecha pairs), optionally for
+    a single month.
+    """
+    month_tickets = tables["month_tickets"]
+    if month is not None:
+        month_tickets = month_tickets[month_tickets["mes"] == month]
+    return int(month_tickets["tickets"].sum())
+
+def heatmap_grid(tables, hours, days=range(7)):
+    """
+    Spend per hour (rows) and weekday (columns), restricted to the given hours.
+
+    Returns:
+    - pd.DataFrame: Spend with every requested hour and day, zero when empty.
+    """
+    return tables["heatmap"].pivot_table(
+        values="precio",
+        index="hour_of_day",
+        columns="day_of_week",
+        aggfunc="sum",
+        fill_value=0
+    ).reindex(index=hours, columns=days, fill_value=0)
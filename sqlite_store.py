@@ -0,0 +1,214 @@
+import os
+import sqlite3
+from contextlib import closing
+import pandas as pd
+import storage
+
+# SQLite copy of the dataset used to answer the dashboard's month and category filters
+database_path = "data/mercadata.db"
+
+# Format of the fecha column; sorts like the dates it holds
+SQL_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS tickets (fecha TEXT NOT NULL, mes TEXT NOT NULL, ticket TEXT NOT NULL, "
+    "ubicacion TEXT, item TEXT, categoria TEXT, precio REAL)",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+]
+
+# Every index ends in fecha (and implicitly rowid), so the rows of a month or
+# category come back in dataset order without a sort step
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_tickets_fecha ON tickets (fecha)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_mes ON tickets (mes, fecha)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_ticket ON tickets (ticket)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_categoria ON tickets (categoria, fecha)",
+]
+
+INSERT = "INSERT INTO tickets VALUES (?, ?, ?, ?, ?, ?, ?)"
+
+# Store columns in the order of the SQL table (after fecha and mes)
+_COLUMN_NAMES = {
+    "ticket": "identificativo de ticket",
+    "ubicacion": "ubicación",
+    "item": "item",
+    "categoria": "categoría",
+    "precio": "precio",
+}
+
+def connect(path=database_path):
+    """
+    Opens the database, creating its tables if needed.
+
+    The connection is in autocommit mode; writers wrap their changes in an
+    explicit BEGIN so readers never see them half done, and WAL journaling
+    lets the dashboard keep reading while an ingest writes.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    for statement in SCHEMA:
+        conn.execute(statement)
+    return conn
+
+def _records(df):
+    df = storage.to_typed(df)
+    fecha = df["fecha"].dt.strftime(SQL_DATE_FORMAT)
+    return zip(fecha.tolist(), fecha.str[:7].tolist(), df["identificativo de ticket"].tolist(),
+               df["ubicación"].astype(str).tolist(), df["item"].tolist(), df["categoría"].astype(str).tolist(),
+               df["precio"].tolist())
+
+def _set_source_version(conn, source_version):
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('source_version', ?)", (source_version,))
+
+def source_version(path=database_path):
+    """
+    Returns the storage.dataset_version() the database was last synced with.
+
+    The database is opened read-only and nothing is created, so this is cheap
+    enough to call on every rerun.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True)) as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'source_version'").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+def write_rows(df, source_version, path=database_path):
+    """
+    Replaces the contents of the database with the given rows.
+
+    The indexes are dropped during the bulk insert and built once at the end.
+
+    Parameters:
+    - df (pd.DataFrame): Rows to store, raw or already typed.
+    - source_version (str): Version of the columnar store the rows come from.
+    """
+    with closing(connect(path)) as conn:
+        with conn:
+            conn.execute("BEGIN")
+            conn.execute("DROP TABLE tickets")
+            for statement in SCHEMA:
+                conn.execute(statement)
+            conn.executemany(INSERT, _records(df))
+            for statement in INDEXES:
+                conn.execute(statement)
+            _set_source_version(conn, source_version)
+
+def append_rows(df, source_version, path=database_path):
+    """
+    Appends rows to the database in a single transaction.
+
+    Parameters:
+    - df (pd.DataFrame): Rows to append, raw or already typed.
+    - source_version (str): Version of the columnar store after the append.
+    """
+    with closing(connect(path)) as conn:
+        with conn:
+            conn.execute("BEGIN")
+            for statement in INDEXES:
+                conn.execute(statement)
+            conn.executemany(INSERT, _records(df))
+            _set_source_version(conn, source_version)
+
+def ensure_database(store_root=storage.store_path, path=database_path):
+    """
+    Rebuilds the database from the columnar store when it is missing or was
+    last synced with a different version of the store.
+    """
+    version = storage.dataset_version(store_root)
+    if source_version(path) != version:
+        write_rows(storage.read_dataset(store_root), version, path)
+
+def _query(sql, params=(), limit=None, offset=0, path=database_path):
+    """
+    Runs a row query and returns the rows in the dashboard's layout.
+
+    Parameters:
+    - limit, offset (int): Page of the result to return; every row when limit is None.
+
+    Returns:
+    - pd.DataFrame: Store columns (see storage.COLUMNS) indexed by fecha.
+    """
+    # A negative LIMIT means no limit in SQLite
+    params = (*params, -1 if limit is None else limit, offset)
+    with closing(connect(path)) as conn:
+        df = pd.read_sql_query(sql + " LIMIT ? OFFSET ?", conn, params=params)
+    df["fecha"] = pd.to_datetime(df["fecha"], format=SQL_DATE_FORMAT)
+    df = df.rename(columns=_COLUMN_NAMES).set_index("fecha")
+    for column in storage.CATEGORICAL_COLUMNS:
+        df[column] = df[column].astype("category")
+    return df
+
+def month_rows(month, limit=None, offset=0, path=database_path):
+    """
+    Rows of a month ("YYYY-MM"), or a page of them, read through the month index.
+    """
+    return _query("SELECT fecha, ticket, ubicacion, item, categoria, precio FROM tickets "
+                  "WHERE mes = ? ORDER BY fecha, rowid", (month,), limit, offset, path)
+
+def category_rows(category, limit=None, offset=0, path=database_path):
+    """
+    Rows of a category, or a page of them, read through the category index.
+    """
+    return _query("SELECT fecha, ticket, ubicacion, item, categoria, precio FROM tickets "
+                  "WHERE categoria = ? ORDER BY fecha, rowid", (category,), limit, offset, path)
+
+def row_count(month=None, category=None, path=database_path):
+    """
+    Number of rows, optionally of a single month or category.
+    """
+    sql = "SELECT COUNT(*) FROM tickets"
+    params = ()
+    if month is not None:
+        sql += " WHERE mes = ?"
+        params = (month,)
+    elif category is not None:
+        sql += " WHERE categoria = ?"
+        params = (category,)
+    with closing(connect(path)) as conn:
+        return conn.execute(sql, params).fetchone()[0]
+
+def list_categories(path=database_path):
+    """
+    Lists the categories present in the database.
+
+    Returns:
+    - list: Sorted category names.
+    """
+    with closing(connect(path)) as conn:
+        return [row[0] for row in conn.execute("SELECT DISTINCT categoria FROM tickets ORDER BY categoria")]
+
+def category_totals(month=None, path=database_path):
+    """
+    Spend and number of items per category, optionally for a single month.
+
+    Returns:
+    - pd.DataFrame: precio and items columns indexed by categoría, as
+      rollups.category_totals.
+    """
+    sql = "SELECT categoria AS 'categoría', SUM(precio) AS precio, COUNT(*) AS items FROM tickets"
+    params = ()
+    if month is not None:
+        sql += " WHERE mes = ?"
+        params = (month,)
+    with closing(connect(path)) as conn:
+        return pd.read_sql_query(sql + " GROUP BY categoria ORDER BY categoria", conn, params=params).set_index("categoría")
+
+def ticket_count(month=None, path=database_path):
+    """
+    Number of tickets (distinct ticket and fecha pairs, as rollups.ticket_count),
+    optionally for a single month.
+    """
+    sql = "SELECT COUNT(*) FROM (SELECT DISTINCT ticket, fecha FROM tickets"
+    params = ()
+    if month is not None:
+        sql += " WHERE mes = ?"
+        params = (month,)
+    with closing(connect(path)) as conn:
+        return conn.execute(sql + ")", params).fetchone()[0]
@@ -0,0 +1,164 @@
+import os
+import pandas as pd
+import transactions
+
+# Root directory of the columnar dataset, one Parquet file per month
+store_path = "data/store"
+
+# Date format used by the tickets and the CSV export
+DATE_FORMAT = "%d/%m/%Y %H:%M"
+
+COLUMNS = ["fecha", "identificativo de ticket", "ubicación", "item", "categoría", "precio"]
+CATEGORICAL_COLUMNS = ["ubicación", "categoría"]
+
+def to_typed(df):
+    """
+    Converts ticket rows as produced by the parser (or read from the CSV) to the
+    typed schema of the store.
+
+    Parameters:
+    - df (pd.DataFrame): Rows with the COLUMNS columns and fecha as text.
+
+    Returns:
+    - pd.DataFrame: A copy with fecha as datetime (NaT when it is missing or
+      malformed), ubicación and categoría as categoricals, the ticket id as
+      text and precio as float.
+    """
+    df = df[COLUMNS].copy()
+    if not pd.api.types.is_datetime64_any_dtype(df["fecha"]):
+        df["fecha"] = pd.to_datetime(df["fecha"], format=DATE_FORMAT, errors="coerce")
+    df["identificativo de ticket"] = df["identificativo de ticket"].astype(str)
+    df["item"] = df["item"].astype(str)
+    df["precio"] = df["precio"].astype(float)
+    for column in CATEGORICAL_COLUMNS:
+        df[column] = df[column].astype("category")
+    return df
+
+def partition_path(month, root=store_path):
+    """
+    Returns the file holding the rows of a month ("YYYY-MM").
+    """
+    return os.path.join(root, f"{month}.parquet")
+
+def list_months(root=store_path):
+    """
+    Lists the months present in the store.
+
+    Returns:
+    - list: Sorted "YYYY-MM" strings.
+    """
+    if not os.path.isdir(root):
+        return []
+    return sorted(name[:-len(".parquet")] for name in os.listdir(root) if name.endswith(".parquet"))
+
+def dataset_version(root=store_path):
+    """
+    Returns a token that changes whenever a month of the store is written.
+
+    Only file metadata is read, so it is cheap enough to call on every rerun.
+    """
+    if not os.path.isdir(root):
+        return ""
+    entries = sorted((entry for entry in os.scandir(root) if entry.name.endswith(".parquet")),
+                     key=lambda entry: entry.name)
+    return "|".join(f"{entry.name}:{entry.stat().st_mtime_ns}:{entry.stat().st_size}" for entry in entries)
+
+def _write_partition(df, month, root):
+    with transactions.atomic_file(partition_path(month, root)) as f:
+        df.to_parquet(f, index=False)
+
+def append_partitions(df, root=store_path):
+    """
+    Appends rows to the store, rewriting only the months they belong to.
+
+    Parameters:
+    - df (pd.DataFrame): Rows to append, raw or already typed.
+    """
+    os.makedirs(root, exist_ok=True)
+    df = to_typed(df)
+    for month, rows in df.groupby(df["fecha"].dt.strftime("%Y-%m"), sort=True):
+        path = partition_path(month, root)
+        if os.path.exists(path):
+            rows = pd.concat([pd.read_parquet(path), rows], ignore_index=True)
+        _write_partition(to_typed(rows), month, root)
+
+def write_partitions(df, root=store_path):
+    """
+    Replaces the whole store with the given rows.
+
+    Every month is replaced atomically and the months missing from df are
+    removed afterwards, so readers never find the store empty.
+
+    Parameters:
+    - df (pd.DataFrame): Rows to store, raw or already typed.
+    """
+    os.makedirs(root, exist_ok=True)
+    df = to_typed(df)
+    months = set()
+    for month, rows in df.groupby(df["fecha"].dt.strftime("%Y-%m"), sort=True):
+        _write_partition(to_typed(rows), month, root)
+        months.add(month)
+    for month in list_months(root):
+        if month not in months:
+            os.remove(partition_path(month, root))
+
+def read_dataset(root=store_path, columns=None, months=None, filters=None):
+    """
+    Reads rows from the store.
+
+    Only the requested months are opened and only the requested columns are
+    decoded, so the cost depends on what the caller needs rather than on the
+    total history.
+
+    Parameters:
+    - root (str): Store directory.
+    - columns (list): Columns to read, all of them when None.
+    - months (list): "YYYY-MM" months to read, all of them when None.
+    - filters (list): Row filters pushed down to the Parquet reader, e.g.
+      [("categoría", "==", "Frutas")].
+
+    Returns:
+    - pd.DataFrame: The selected rows, ordered by month.
+    """
+    columns = list(columns) if columns is not None else COLUMNS
+    available = list_months(root)
+    if months is not None:
+        wanted = set(months)
+        available = [month for month in available if month in wanted]
+
+    frames = [pd.read_parquet(partition_path(month, root), columns=columns, filters=filters)
+              for month in available]
+    if not frames:
+        return to_typed(pd.DataFrame(columns=COLUMNS))[columns]
+
+    df = pd.concat(frames, ignore_index=True)
+    # Categories differ between partitions, so concat falls back to object
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+    return df
+
+def import_csv(csv_path, root=store_path):
+    """
+    Replaces the store with the contents of a ticket CSV.
+    """
+    write_partitions(pd.read_csv(csv_path, dtype={"identificativo de ticket": str}), root)
+
+def export_csv(csv_path, root=store_path):
+    """
+    Writes the whole store as a ticket CSV in the format produced by process_pdfs.
+    """
+    df = read_dataset(root)
+    df["fecha"] = df["fecha"].dt.strftime(DATE_FORMAT)
+    df.to_csv(csv_path, index=False)
+
+def ensure_store(csv_path, root=store_path):
+    """
+    Builds the store from the CSV the first time the dataset is opened.
+
+    Returns:
+    - bool: Whether the store holds any data.
+    """
+    if not list_months(root) and os.path.exists(csv_path) and os.path.getsize(csv_path) > 0:
+        import_csv(csv_path, root)
+    return bool(list_months(root))
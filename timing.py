@@ -0,0 +1,120 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import pandas as pd
+
+# Log and labels that stage() records into, per thread (see collecting)
+_local = threading.local()
+
+class TimingLog:
+    """
+    Collects the duration of named stages.
+
+    Every record has the run it belongs to (one ingest batch or one dashboard
+    rerun), a scope ("ticket", "ingest" or "dashboard"), the name of the ticket
+    or section it refers to, the stage and its duration in seconds.
+    """
+
+    def __init__(self, run=None):
+        self.run = run or datetime.now().isoformat(timespec="milliseconds")
+        self.records = []
+
+    def add(self, stage, seconds, scope="", name=""):
+        self.records.append({"run": self.run, "scope": scope, "name": name, "stage": stage, "seconds": seconds})
+
+    def extend(self, records):
+        """
+        Adds records collected elsewhere (e.g. in a worker process) to this run.
+        """
+        for record in records:
+            self.records.append(dict(record, run=self.run))
+
+    @contextmanager
+    def stage(self, stage, scope="", name=""):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start, scope, name)
+
+    def to_frame(self):
+        return pd.DataFrame(self.records, columns=["run", "scope", "name", "stage", "seconds"])
+
+    def summary(self):
+        """
+        Aggregates the records per scope and stage.
+
+        Returns:
+        - pd.DataFrame: count, total, mean and max seconds, slowest stages first.
+        """
+        return (self.to_frame().groupby(["scope", "stage"])["seconds"]
+                .agg(["count", "sum", "mean", "max"])
+                .rename(columns={"sum": "total"})
+                .sort_values("total", ascending=False))
+
+    def to_json(self, path=None):
+        """
+        Serializes the records as a JSON list, optionally writing them to path.
+        """
+        text = json.dumps(self.records, ensure_ascii=False, indent=2)
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+        return text
+
+    def to_csv(self, path=None):
+        """
+        Serializes the records as CSV, optionally writing them to path.
+        """
+        return self.to_frame().to_csv(path, index=False)
+
+    def save(self, path):
+        """
+        Writes the records to path, as CSV when it ends in .csv and JSON otherwise.
+        """
+        if path.lower().endswith(".csv"):
+            self.to_csv(path)
+        else:
+            self.to_json(path)
+
+@contextmanager
+def collecting(log, scope="", name=""):
+    """
+    Makes stage() record into log, labelled with scope and name, for the
+    duration of the block in the current thread.
+    """
+    previous = getattr(_local, "active", None), getattr(_local, "nested", None)
+    _local.active = (log, scope, name)
+    _local.nested = None
+    try:
+        yield log
+    finally:
+        _local.active, _local.nested = previous
+
+@contextmanager
+def stage(stage_name):
+    """
+    Times a block into the log made active by collecting(); a no-op otherwise,
+    so instrumented code costs nothing when nobody is collecting.
+
+    Stages record their own time only: the time of stages nested inside them
+    (e.g. a page extracted lazily while the item loop runs) is subtracted, so
+    the stages of a ticket add up to its total.
+    """
+    active = getattr(_local, "active", None)
+    if active is None:
+        yield
+        return
+    log, scope, name = active
+    # Time spent in the stages nested in the enclosing one (None at top level)
+    outer = _local.nested
+    _local.nested = 0.0
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        log.add(stage_name, elapsed - _local.nested, scope, name)
+        _local.nested = None if outer is None else outer + elapsed
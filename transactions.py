@@ -0,0 +1,147 @@
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows: only the threads of this process are serialized
+    fcntl = None
+
+# Lock file serializing every writer of the dataset, across processes
+lock_path = "data/mercadata.lock"
+
+# Write-ahead journal of the commit in progress; present only until the commit completes
+journal_path = "data/mercadata.journal"
+
+# flock() does not exclude other threads of the same process reliably, so
+# threads are serialized first; the depth makes the lock re-entrant
+_thread_lock = threading.RLock()
+_local = threading.local()
+
+@contextmanager
+def exclusive_lock(path=lock_path, blocking=True):
+    """
+    Holds the dataset write lock for the duration of the block.
+
+    Parameters:
+    - path (str): Lock file.
+    - blocking (bool): Wait for the lock. Otherwise the block runs at once
+      and receives False when another writer holds it.
+
+    Yields:
+    - bool: Whether the lock is held.
+    """
+    if not _thread_lock.acquire(blocking):
+        yield False
+        return
+    try:
+        depth = getattr(_local, "depth", 0)
+        if depth or fcntl is None:
+            _local.depth = depth + 1
+            try:
+                yield True
+            finally:
+                _local.depth = depth
+            return
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "a") as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            _local.depth = 1
+            try:
+                yield True
+            finally:
+                _local.depth = 0
+                fcntl.flock(f, fcntl.LOCK_UN)
+    finally:
+        _thread_lock.release()
+
+@contextmanager
+def atomic_file(path, mode="wb", encoding=None):
+    """
+    Writes a file through a temporary file in the same directory that replaces
+    it atomically once the block succeeds.
+
+    Readers see either the previous or the new content, never a partial
+    file, and concurrent writers never share a temporary file. The data is
+    flushed to disk before the rename so a crash cannot leave an empty file
+    behind. If the block raises, the target is left untouched.
+
+    Yields:
+    - file: The temporary file, opened with mode and encoding.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with open(fd, mode, encoding=encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def write_at(path, offset, data):
+    """
+    Truncates a file to its first offset bytes and writes data after them, in place.
+
+    Appending this way (offset being the current size) costs only the size of
+    data, and repeating it with the same arguments yields the same file, which
+    makes it safe to redo from the journal. The file is briefly incomplete
+    while it is written, so it must only be read with the dataset lock held.
+
+    Parameters:
+    - path (str): File to write; created when missing.
+    - offset (int): Number of leading bytes of the current file to preserve.
+    - data (bytes): Content written after them.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "ab") as f:
+        f.truncate(offset)
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+def file_size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+def write_journal(entry, path=journal_path):
+    """
+    Durably records a commit before any of its changes are applied.
+    """
+    with atomic_file(path, "w", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False)
+
+def read_journal(path=journal_path):
+    """
+    Returns the journal of an unfinished commit, or None when there is none.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def clear_journal(path=journal_path):
+    """
+    Marks the commit recorded in the journal as complete.
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass